@@ -1,9 +1,8 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -11,7 +10,18 @@ from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from helpers import get_form_submission_info, upcoming_past_shows, provide_min_show, get_search_result
+from helpers import get_form_submission_info, provide_min_show, listing_filters, venue_pages, artist_pages, availability_info, booking_verdict
+from queries import venue_areas, show_rows, keyset_page, decode_cursor, catalog_filters
+from search import search_names
+from filters import format_datetime
+from cache import cache
+from schedule import within_availability, find_conflict, find_conflicts
+from sqlalchemy.exc import IntegrityError
+from commands import catalog_cli
+from export import export_text, EXPORT_FORMATS
+from details import VenueDetail, ArtistDetail
+from pool_stats import pool_stats
+from profiler import profiler
 from models import *
 #----------------------------------------------------------------------------#
 # App Config.
@@ -22,19 +32,17 @@ moment = Moment(app)
 app.config.from_object('config')
 db.init_app(app)
 Migrate(app, db)
+app.cli.add_command(catalog_cli)
+cache.init_app(app)
+with app.app_context():
+    pool_stats.init_app(app, db.engine)
+    profiler.init_app(app, db.engine)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
-
+# cached pattern/output formatting (filters.py)
 app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
@@ -50,44 +58,41 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cache.cached
 def venues():
-    """Returns all the venues with formatted data."""
-    venues = db.session.query(Venue).all()
-    areas = {}
-    for venue in venues:
-        city_state = f'{venue.city},{venue.state}' 
-        venue_info = {'id': venue.id, 'name': venue.name, 'num_upcoming_shows': len(venue.shows)}
-        # if city is not in the areas dictionary 
-        if not areas.get(city_state):
-            # create a new key with a dictionary as its value
-            areas[city_state] = {}
-            # format the key (city) value with additional information 
-            areas[city_state]['venues'] = []
-        # append the venue_info to the to the city
-        areas[city_state]['venues'].append(venue_info)
-    return render_template('pages/venues.html', areas=areas)
+    """Returns all the venues with formatted data, ?genre= / ?city= / ?state= narrow them down."""
+    try:
+        filters = listing_filters(request.args)
+    except ValueError:
+        abort(400)
+    # venues grouped by city/state, with their upcoming show counts, in a single query (queries.py)
+    areas = venue_areas(db.session, catalog_filters(db.session, Venue, **filters))
+    return render_template('pages/venues.html', areas=areas, filters=filters, genres=GENRES)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
     search_term = request.form.get('search_term', None)
     response = None
     if search_term:
-        # uses a helper function (helpers.py) that searches the databbase for the search term(s) provided in the POST submission
-        response = get_search_result(search_term, db.session, Venue)
+        # one ranked, paged query over the indexed venue names (search.py) for the search term(s) provided in the POST submission
+        page = max(request.form.get('page', 1, type=int), 1)
+        response = search_names(db.session, Venue, search_term, page)
     else:
         flash('Did not provide a search term.')
         return redirect('/venues')
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@cache.cached
 def show_venue(venue_id):
     """Shows the venue page with the given venue_id"""
-    venue = db.session.query(Venue).get(venue_id)
-    # getting the key/value pairs from the venue class instance
-    data = venue.__dict__
-    # adding upcoming / past shows to the venue
-    upcoming_past_shows(data, venue.shows)
-    return render_template('pages/show_venue.html', venue=data)
+    # past shows are paged, ?past_page=2 shows the next older ones
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    # the venue columns with its upcoming / past shows, no ORM instance is loaded (details.py)
+    venue = VenueDetail.load(db.session, venue_id, past_page)
+    if venue is None:
+        abort(404)
+    return render_template('pages/show_venue.html', venue=venue)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -105,6 +110,7 @@ def create_venue_submission(result_params):
     try:
       db.session.add(temp_venue)
       db.session.commit()
+      cache.invalidate('/venues')
       flash('Venue ' + temp_venue.name + ' was successfully listed!')
       return redirect('/venues')
     except Exception as e:
@@ -120,10 +126,13 @@ def create_venue_submission(result_params):
 def delete_artist(artist_id):
     # getting an instance of the artist
     artist = db.session.query(Artist).get(artist_id)
+    # cached pages showing the artist, looked up before its shows are gone
+    pages = artist_pages(db.session, artist_id)
     try:
         # pending deletion to our transaction
         db.session.delete(artist)
         db.session.commit()
+        cache.invalidate('/artists', '/venues', '/shows', *pages)
         flash(f'{artist.name} deleted.')
         return jsonify({'result': True})
     except Exception as e:
@@ -139,9 +148,12 @@ def delete_venue(venue_id):
       flash("Invalid venue_id given.")
       return jsonify({'result': False})
     
+    # cached pages showing the venue, looked up before its shows are gone
+    pages = venue_pages(db.session, venue_id)
     try:
       db.session.delete(venue)
       db.session.commit()
+      cache.invalidate('/venues', '/shows', *pages)
       flash(f'{venue.name} deleted.')
       return jsonify({'result': True})
     except Exception as e:
@@ -153,25 +165,41 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 @app.route('/artists')
+@cache.cached
 def artists():
-    data = db.session.query(Artist).all()
-    return render_template('pages/artists.html', artists=data)
+    """
+    Lists the artists a page at a time, ?after=<cursor> continues after the previous page and ?format=json returns JSON.
+    ?genre= / ?city= / ?state= narrow them down.
+    """
+    try:
+        filters = listing_filters(request.args)
+        after = decode_cursor(request.args.get('after'), int)
+    except ValueError:
+        abort(400)
+    query = db.session.query(Artist.id, Artist.name).filter(*catalog_filters(db.session, Artist, **filters))
+    data, next_cursor = keyset_page(query, (Artist.id,), after)
+    if request.args.get('format') == 'json':
+        return jsonify({'artists': [{'id': artist.id, 'name': artist.name} for artist in data], 'next': next_cursor})
+    return render_template('pages/artists.html', artists=data, next_cursor=next_cursor, filters=filters, genres=GENRES)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
     search_term = request.form.get('search_term', '');
     response = None
     if search_term:
-        response = get_search_result(search_term, db.session, Artist)
+        page = max(request.form.get('page', 1, type=int), 1)
+        response = search_names(db.session, Artist, search_term, page)
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@cache.cached
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
-    artist = db.session.query(Artist).get(artist_id)
-    # get key value pair of variables and values in the current instance of the class 
-    data = artist.__dict__
-    upcoming_past_shows(data, artist.shows)
+    past_page = max(request.args.get('past_page', 1, type=int), 1)
+    # the artist columns with its upcoming / past shows (details.py)
+    artist = ArtistDetail.load(db.session, artist_id, past_page)
+    if artist is None:
+        abort(404)
     return render_template('pages/show_artist.html', artist=artist)
 
 # sends back availability restriction information of the artist
@@ -179,21 +207,7 @@ def show_artist(artist_id):
 def get_availability(artist_id):
     """Send back availability restriction information of the artist.""" 
     artist = db.session.query(Artist).get(artist_id)
-    message = {'exist': True, 'id': artist_id, 'available': True}
-    if not artist:
-        message['exist'] = False
-        return jsonify(message)
-    # check whether the artist is available for booking
-    if not artist.seeking_venue:
-        message['available'] = False
-        return jsonify(message)
-    if artist.availability_restriction:
-        message['restriction'] = True
-        message['from_time'] = artist.from_time 
-        message['to_time'] = artist.to_time
-    else:
-        message['restriction'] = False
-    return jsonify(message)
+    return jsonify(availability_info(artist, artist_id))
 
 @app.route('/artists/<int:artist_id>/available', methods=['POST'])
 def is_artist_available(artist_id):
@@ -208,7 +222,7 @@ def is_artist_available(artist_id):
         try:
             # in order to compare need datetime object from start_time string
             start_time = datetime.fromisoformat(start_time)
-            if start_time < datetime.fromisoformat(artist.to_time) and start_time > datetime.fromisoformat(artist.from_time):
+            if within_availability(artist, start_time):
                 message['valid'] = True
                 return jsonify(message)
             else:
@@ -229,36 +243,74 @@ def venue_exist(venue_id):
         return jsonify({'exist': False, 'id': venue_id})
     return jsonify({'exist': True, 'id': venue_id})
 
+# most ids + checks a single /availability request may ask about
+MAX_AVAILABILITY_BATCH = 1000
+
+@app.route('/availability', methods=['POST'])
+def batch_availability():
+    """
+    Batched version of /artists/<id>/get_availability, /venues/<id>/exist and /artists/<id>/available.
+    Body: {"artist_ids": [...], "venue_ids": [...], "checks": [{"artist_id": 1, "venue_id": 2, "start_time": "iso date"}, ...]}
+    Each table is queried once with IN (...) for every id in the request, however many there are.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort(400)
+    checks = body.get('checks', [])
+    try:
+        checks = [(int(check['artist_id']), int(check['venue_id']) if check.get('venue_id') is not None else None, check.get('start_time')) for check in checks]
+        artist_ids = {int(artist_id) for artist_id in body.get('artist_ids', [])} | {artist_id for artist_id, _, _ in checks}
+        venue_ids = {int(venue_id) for venue_id in body.get('venue_ids', [])} | {venue_id for _, venue_id, _ in checks if venue_id is not None}
+    except (KeyError, TypeError, ValueError, AttributeError):
+        abort(400)
+    if len(artist_ids) + len(venue_ids) + len(checks) > MAX_AVAILABILITY_BATCH:
+        abort(413)
+
+    artists = {}
+    if artist_ids:
+        rows = db.session.query(Artist.id, Artist.seeking_venue, Artist.availability_restriction, Artist.from_time, Artist.to_time)\
+            .filter(Artist.id.in_(artist_ids))
+        artists = {artist.id: artist for artist in rows}
+    venues = set()
+    if venue_ids:
+        venues = {venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+
+    # double bookings of every check with an existing artist and a valid start_time, see schedule.find_conflicts
+    bookings, positions = [], []
+    for i, (artist_id, venue_id, start_time) in enumerate(checks):
+        try:
+            start_time = datetime.fromisoformat(start_time)
+        except (TypeError, ValueError):
+            continue
+        if artist_id in artists:
+            bookings.append((artist_id, venue_id if venue_id in venues else None, start_time, start_time + SHOW_DURATION))
+            positions.append(i)
+    conflicts = dict(zip(positions, find_conflicts(db.session, bookings))) if bookings else {}
+
+    verdicts = []
+    for i, (artist_id, venue_id, start_time) in enumerate(checks):
+        verdict = booking_verdict(artists.get(artist_id), venue_id in venues if venue_id is not None else None, start_time, conflicts.get(i))
+        verdicts.append({'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time, **verdict})
+    return jsonify({
+        'artists': {artist_id: availability_info(artists.get(artist_id), artist_id) for artist_id in artist_ids},
+        'venues': {venue_id: {'exist': venue_id in venues, 'id': venue_id} for venue_id in venue_ids},
+        'checks': verdicts
+    })
+
 #  Update
 #  ----------------------------------------------------------------
 
 
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id, **kwargs):
-    form = ArtistForm()
-    # get artist that is trying to be updated
     artist = db.session.query(Artist).get(artist_id)
-    # populate form with fields from artist with ID <artist_id>
-    form.name.render_kw = {'value': artist.name}
-    form.city.render_kw = {'value': artist.city}
-    form.phone.render_kw = {'value': artist.phone}
-    form.image_link.render_kw = {'value': artist.image_link}
-    form.facebook_link.render_kw = {'value': artist.facebook_link}
-    form.website_link.render_kw = {'value': artist.website}
-    form.seeking_description.render_kw = {'value': artist.seeking_description}
-    # default processed after form is instantiated, so doing: form.default has no effect, thus need to change via data attribute 
-    form.availability_restriction.data = artist.availability_restriction
-    form.genres.data = artist.genres
-    form.seeking_venue.data = artist.seeking_venue
-    form.state.data = artist.state
-    # if the artist contains from_time / to_time
-    if artist.availability_restriction:
-        form.from_time.render_kw = {'value': artist.from_time}
-        form.to_time.render_kw = {'value': artist.to_time}
-    else:
+    if artist is None:
+        abort(404)
+    # the form reads its fields straight from the artist, website is website_link in the form
+    form = ArtistForm(obj=artist, website_link=artist.website)
+    if not artist.availability_restriction:
         # provide current time as defaults
-        form.from_time.render_kw = {'value': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        form.to_time.render_kw = {'value': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        form.from_time.data = form.to_time.data = datetime.now().replace(microsecond=0)
 
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -271,6 +323,7 @@ def edit_artist_submission(artist_id, result_params):
         db.session.query(Artist).filter(Artist.id==artist_id).update(result_params)
         # save updates 
         db.session.commit()
+        cache.invalidate('/artists', '/shows', *artist_pages(db.session, artist_id))
         flash(f'Updated artist with account id of: {artist_id}')
         return redirect(url_for('show_artist', artist_id=artist_id))
     except Exception as e:
@@ -282,23 +335,11 @@ def edit_artist_submission(artist_id, result_params):
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     """Renders form to edit"""
-    form = VenueForm()
-    # get artist that is trying to be updated
     venue = db.session.query(Venue).get(venue_id)
-    # populate form with fields from artist with ID <artist_id>
-    form.name.render_kw = {'value': venue.name}
-    form.city.render_kw = {'value': venue.city}
-    form.phone.render_kw = {'value': venue.phone}
-    form.image_link.render_kw = {'value': venue.image_link}
-    # default processed after form is instantiated, so doing: form.default has no effect, thus need to change via data keyword
-    form.facebook_link.render_kw = {'value': venue.facebook_link}
-    form.website_link.render_kw = {'value': venue.website}
-    form.seeking_description.render_kw = {'value': venue.seeking_description}
-    form.address.render_kw = {'value': venue.address}
-
-    form.seeking_talent.data = venue.seeking_talent
-    form.genres.data = venue.genres
-    form.state.data = venue.state
+    if venue is None:
+        abort(404)
+    # the form reads its fields straight from the venue, website is website_link in the form
+    form = VenueForm(obj=venue, website_link=venue.website)
 
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
@@ -310,6 +351,7 @@ def edit_venue_submission(venue_id, result_params):
     try:
         db.session.query(Venue).where(Venue.id==venue_id).update(result_params)
         db.session.commit()
+        cache.invalidate('/venues', '/shows', *venue_pages(db.session, venue_id))
         flash(f'Updated venue: {result_params.get("name")}')
     except Exception as e:
         db.session.rollback()
@@ -335,6 +377,7 @@ def create_artist_submission(result_params):
       temp_actor = Artist(**result_params)
       db.session.add(temp_actor)
       db.session.commit()
+      cache.invalidate('/artists')
       # on successful db insert, flash success
       flash('Artist ' + temp_actor.name + ' was successfully listed!')
       return render_template('pages/home.html')
@@ -348,14 +391,24 @@ def create_artist_submission(result_params):
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cache.cached
 def shows():
     """
-    Shows all upcoming shows.
+    Shows the upcoming shows a page at a time (soonest first), ?after=<cursor> continues after the previous page
+    and ?format=json returns JSON.
     """
-    data = db.session.query(Show).all()
-    # ("Show" by default only contains a start_time, but it has a relationship which links the "Show" to its relative Artist/Venue. So, provide_min_show() takes advantage of that and formats the data relative to the provided default data given in the starter code.)
-    data = [provide_min_show(show) for show in data if datetime.fromisoformat(show.start_time) > datetime.now()]
-    return render_template('pages/shows.html', shows=data)
+    try:
+        after = decode_cursor(request.args.get('after'), datetime.fromisoformat, int)
+    except ValueError:
+        abort(400)
+    # only one page of the upcoming shows is fetched, the start_time filter runs in the database (queries.py)
+    upcoming = show_rows(db.session).filter(Show.start_time > datetime.now(timezone.utc))
+    data, next_cursor = keyset_page(upcoming, (Show.start_time, Show.id), after)
+    # (show_rows() joins the Artist/Venue columns of each show in the same select, provide_min_show() formats them relative to the provided default data given in the starter code.)
+    data = [provide_min_show(show) for show in data]
+    if request.args.get('format') == 'json':
+        return jsonify({'shows': data, 'next': next_cursor})
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
 
 @app.route('/shows/create')
 def create_shows():
@@ -386,29 +439,71 @@ def create_show_submission():
 
     try:
         # check if proper iso format was given (when converting to datetime object, if invalid iso format given a ValueError is raised, we catch.)
-        datetime.fromisoformat(st)
-        if artist.availability_restriction:
-            start_time = datetime.fromisoformat(st)
-            if start_time > datetime.fromisoformat(artist.to_time) or start_time < datetime.fromisoformat(artist.from_time):
-                flash('Start time did not meet artist availability restriction criteria')
-                return redirect('/shows/create')
-        temp_show = Show(start_time=st)
+        start_time = datetime.fromisoformat(st)
+        if not within_availability(artist, start_time):
+            flash('Start time did not meet artist availability restriction criteria')
+            return redirect('/shows/create')
+        end_time = start_time + SHOW_DURATION
+        # reject double bookings of the artist or the venue (postgres also enforces this with exclusion constraints)
+        conflict = find_conflict(db.session, artist.id, venue.id, start_time, end_time)
+        if conflict:
+            flash(f'The {conflict} already has a show at that time.')
+            return redirect('/shows/create')
+        # setting the foreign keys directly, appending to artist.shows/venue.shows would load every show of both first
+        temp_show = Show(start_time=start_time, end_time=end_time, artist_id=artist.id, venue_id=venue.id)
         db.session.add(temp_show)
-        artist.shows.append(temp_show)
-        venue.shows.append(temp_show)
         db.session.commit()
+        cache.invalidate('/shows', '/venues', f'/venues/{venue.id}', f'/artists/{artist.id}')
         # on successful db insert, flash success
         flash('Show was successfully listed!')
         return redirect('/shows')
     except ValueError:
         flash('Did not provide proper iso format date')
         return redirect('/shows/create')
+    except IntegrityError:
+        # a concurrent booking won the race, the exclusion constraint rejected this one
+        db.session.rollback()
+        flash('The artist or the venue already has a show at that time.')
+        return redirect('/shows/create')
     except Exception as e:
         db.session.rollback()
         flash('An error occurred. Show could not be listed.')
         # return render_template('pages/home.html')
         return redirect('/shows/create')
 
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<any(venues, artists, shows):kind>')
+def export(kind):
+    """Streams every venue/artist/show as csv (default) or ?format=json, memory stays flat however large the table is."""
+    format = request.args.get('format', 'csv')
+    if format not in EXPORT_FORMATS:
+        abort(400)
+    # stream_with_context keeps the request (and its db session) alive while the response is generated
+    return Response(stream_with_context(export_text(db.session, kind, format)), mimetype=EXPORT_FORMATS[format],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{format}'})
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@app.route('/_stats/db')
+def db_stats():
+    """Connection pool statistics of this worker process (checkout latency, waits, connections in use)."""
+    if not app.config['STATS_ENDPOINTS']:
+        abort(404)
+    return jsonify(pool_stats.snapshot(db.engine.pool))
+
+@app.route('/_stats/queries')
+def query_stats():
+    """Queries per request, db time and slowest statements of every endpoint (QUERY_PROFILER), ?reset=1 starts over."""
+    if not app.config['STATS_ENDPOINTS'] or not profiler.enabled:
+        abort(404)
+    report = profiler.report()
+    if request.args.get('reset'):
+        profiler.reset()
+    return jsonify(report)
+
 #----------------
 # Error handlers
 #----------------
@@ -0,0 +1,113 @@
+"""
+Builds and renders the artist/venue edit forms, once the way edit_artist/edit_venue used to
+(SelectFields copying list choices, a render_kw dict per field) and once the current way
+(obj= binding, frozen choice tuples, cached <option> html from forms.CachedSelect).
+
+    python benchmarks/bench_edit_forms.py [number of renders]
+
+No database is touched, the artist/venue are plain objects with the model's attributes.
+The whole edit page, database included, is covered by the edit_artist/edit_venue routes of bench_routes.py.
+"""
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+from types import SimpleNamespace
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from wtforms import SelectField, SelectMultipleField
+from app import app
+import forms
+from forms import ArtistForm, VenueForm, STATES, GENRES
+
+class LegacyArtistForm(ArtistForm):
+    state = SelectField('state', choices=list(STATES))
+    genres = SelectMultipleField('genres', choices=list(GENRES))
+
+class LegacyVenueForm(VenueForm):
+    state = SelectField('state', choices=list(STATES))
+    genres = SelectMultipleField('genres', choices=list(GENRES))
+
+ARTIST = SimpleNamespace(
+    id=1, name='Guns N Petals', city='San Francisco', state='CA', phone='326-123-5000',
+    image_link='https://example.com/artists/1.jpg', facebook_link='https://www.facebook.com/GunsNPetals',
+    website='https://www.gunsnpetalsband.com', genres=['Rock n Roll', 'Blues'], seeking_venue=True,
+    seeking_description='Looking for shows to perform at in the San Francisco Bay Area!',
+    availability_restriction=True, from_time=datetime(2021, 5, 1, 18), to_time=datetime(2021, 9, 1, 23))
+VENUE = SimpleNamespace(
+    id=1, name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street', phone='123-123-1234',
+    image_link='https://example.com/venues/1.jpg', facebook_link='https://www.facebook.com/TheMusicalHop',
+    website='https://www.themusicalhop.com', genres=['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk'],
+    seeking_talent=True, seeking_description='We are on the lookout for a local artist to play every two weeks.')
+
+def legacy_artist_form(artist):
+    """edit_artist before the forms were bound with obj=."""
+    form = LegacyArtistForm()
+    form.name.render_kw = {'value': artist.name}
+    form.city.render_kw = {'value': artist.city}
+    form.phone.render_kw = {'value': artist.phone}
+    form.image_link.render_kw = {'value': artist.image_link}
+    form.facebook_link.render_kw = {'value': artist.facebook_link}
+    form.website_link.render_kw = {'value': artist.website}
+    form.seeking_description.render_kw = {'value': artist.seeking_description}
+    form.availability_restriction.data = artist.availability_restriction
+    form.genres.data = artist.genres
+    form.seeking_venue.data = artist.seeking_venue
+    form.state.data = artist.state
+    form.from_time.render_kw = {'value': artist.from_time}
+    form.to_time.render_kw = {'value': artist.to_time}
+    return form
+
+def legacy_venue_form(venue):
+    """edit_venue before the forms were bound with obj=."""
+    form = LegacyVenueForm()
+    form.name.render_kw = {'value': venue.name}
+    form.city.render_kw = {'value': venue.city}
+    form.phone.render_kw = {'value': venue.phone}
+    form.image_link.render_kw = {'value': venue.image_link}
+    form.facebook_link.render_kw = {'value': venue.facebook_link}
+    form.website_link.render_kw = {'value': venue.website}
+    form.seeking_description.render_kw = {'value': venue.seeking_description}
+    form.address.render_kw = {'value': venue.address}
+    form.seeking_talent.data = venue.seeking_talent
+    form.genres.data = venue.genres
+    form.state.data = venue.state
+    return form
+
+def timed(count, build, template, **context):
+    """(seconds to build the form, seconds to build and render the page) for count pages."""
+    with app.test_request_context('/'):
+        started = time.perf_counter()
+        for _ in range(count):
+            build()
+        built = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(count):
+            render_template(template, form=build(), **context)
+        return built, time.perf_counter() - started
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # flask_wtf.Form warns on every instantiation
+    warnings.simplefilter('ignore')
+    app.config['WTF_CSRF_ENABLED'] = False
+    cases = (
+        ('artist', 'forms/edit_artist.html', {'artist': ARTIST},
+         lambda: legacy_artist_form(ARTIST), lambda: ArtistForm(obj=ARTIST, website_link=ARTIST.website)),
+        ('venue', 'forms/edit_venue.html', {'venue': VENUE},
+         lambda: legacy_venue_form(VENUE), lambda: VenueForm(obj=VENUE, website_link=VENUE.website)),
+    )
+    print(f'{count} edit pages')
+    for name, template, context, legacy, current in cases:
+        legacy_built, legacy_page = timed(count, legacy, template, **context)
+        forms.render_options.cache_clear()
+        built, page = timed(count, current, template, **context)
+        print(f'{name} form:  legacy {legacy_built / count * 1e6:7.1f} us  current {built / count * 1e6:7.1f} us  ({legacy_built / built:.1f}x)')
+        print(f'{name} page:  legacy {legacy_page / count * 1e6:7.1f} us  current {page / count * 1e6:7.1f} us  ({legacy_page / page:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Renders pages/shows.html with a synthetic list of shows, once with the original
+datetime filter (dateutil + babel.dates.format_datetime on every call) and once
+with the cached filter from filters.py.
+
+    python benchmarks/bench_format_datetime.py [number of shows]
+
+No database is touched, the shows are the dictionaries provide_min_show() builds.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+from flask import render_template
+from app import app
+import filters
+
+def legacy_format_datetime(value, format='medium'):
+    """The filter as app.py defined it before filters.py."""
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+def make_shows(count):
+    start = datetime(2021, 5, 1, 20, tzinfo=timezone.utc)
+    return [{
+        'artist_image_link': f'https://example.com/artists/{i}.jpg',
+        'start_time': start + timedelta(hours=i),
+        'artist_id': i,
+        'artist_name': f'Artist {i}',
+        'venue_id': i % 50,
+        'venue_name': f'Venue {i % 50}',
+        'venue_image_link': f'https://example.com/venues/{i % 50}.jpg',
+    } for i in range(count)]
+
+def render(shows):
+    with app.test_request_context('/shows'):
+        started = time.perf_counter()
+        render_template('pages/shows.html', shows=shows)
+        return time.perf_counter() - started
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    shows = make_shows(count)
+
+    app.jinja_env.filters['datetime'] = legacy_format_datetime
+    legacy = render(shows)
+
+    app.jinja_env.filters['datetime'] = filters.format_datetime
+    filters._format_datetime.cache_clear()
+    cold = render(shows)
+    warm = render(shows)
+
+    print(f'{count} shows')
+    print(f'legacy filter:        {legacy * 1000:8.1f} ms')
+    print(f'cached filter (cold): {cold * 1000:8.1f} ms  ({legacy / cold:.1f}x)')
+    print(f'cached filter (warm): {warm * 1000:8.1f} ms  ({legacy / warm:.1f}x)')
+
+if __name__ == '__main__':
+    main()
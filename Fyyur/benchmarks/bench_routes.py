@@ -0,0 +1,217 @@
+"""
+Drives every Fyyur route at a configurable concurrency and reports latency percentiles, throughput and
+queries per request, e.g. against a database filled by generate_dataset.py:
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/bench_routes.py --mode server --concurrency 8 --output after.json
+    python benchmarks/bench_routes.py --compare before.json after.json
+
+--mode client calls the app through the Flask test client (no network, shows the cost of the app itself),
+--mode server runs it in a threaded local WSGI server and requests it over http.
+The page cache is off unless --cache, so every request reaches the database.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (name, method, path template, form data); {venue_id}/{artist_id} are filled with random existing ids
+ROUTES = [
+    ('home', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('venue', 'GET', '/venues/{venue_id}', None),
+    ('artists', 'GET', '/artists', None),
+    ('artist', 'GET', '/artists/{artist_id}', None),
+    ('shows', 'GET', '/shows', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'blue hall'}),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'wild band'}),
+    ('edit_artist', 'GET', '/artists/{artist_id}/edit', None),
+    ('edit_venue', 'GET', '/venues/{venue_id}/edit', None),
+]
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+#----------------------------------------------------------------------------#
+# Clients.
+#----------------------------------------------------------------------------#
+
+class TestClientDriver:
+    """One Flask test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, data):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, data=data)
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """The app in a threaded werkzeug server on a free local port, requested over http."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request(self, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.base + path, data=body, method=method)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def close(self):
+        self.server.shutdown()
+
+#----------------------------------------------------------------------------#
+# Running.
+#----------------------------------------------------------------------------#
+
+def run_route(driver, route, requests, concurrency, ids, rng):
+    name, method, template, data = route
+    paths = [template.format(venue_id=rng.choice(ids['venue']), artist_id=rng.choice(ids['artist'])) for _ in range(requests)]
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(path):
+        nonlocal errors
+        started = time.perf_counter()
+        status = driver.request(method, path, data)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            # redirects (e.g. an empty search) are fine, 4xx/5xx are not
+            if status >= 400:
+                errors += 1
+
+    # a few requests to warm up connections and caches outside the measurement
+    for path in paths[:min(5, requests)]:
+        driver.request(method, path, data)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, paths))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(args):
+    # configure the app before it is imported: count queries, cache only on request
+    os.environ['QUERY_PROFILER'] = 'true'
+    if not args.cache:
+        os.environ['CACHE_BACKEND'] = 'none'
+    from app import app
+    from models import db, Venue, Artist
+    from profiler import profiler
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        ids = {'venue': [venue_id for (venue_id,) in db.session.query(Venue.id)],
+               'artist': [artist_id for (artist_id,) in db.session.query(Artist.id)]}
+        dialect = db.engine.dialect.name
+        counts = {'venues': len(ids['venue']), 'artists': len(ids['artist']), 'shows': db.session.execute(db.text('SELECT count(*) FROM shows')).scalar()}
+    if not ids['venue'] or not ids['artist']:
+        sys.exit('the database is empty, fill it with benchmarks/generate_dataset.py first')
+
+    routes = [route for route in ROUTES if not args.routes or route[0] in args.routes]
+    driver = ServerDriver(app) if args.mode == 'server' else TestClientDriver(app)
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        for route in routes:
+            profiler.reset()
+            results[route[0]] = run_route(driver, route, args.requests, args.concurrency, ids, rng)
+            # one endpoint per route, the profiler saw the warm up and the measured requests
+            report = list(profiler.report().values())
+            results[route[0]]['queries_per_request'] = report[0]['queries_per_request'] if report else None
+            print_result(route[0], results[route[0]])
+    finally:
+        driver.close()
+
+    return {
+        'started': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'mode': args.mode,
+        'concurrency': args.concurrency,
+        'requests_per_route': args.requests,
+        'cache': args.cache,
+        'database': dialect,
+        'rows': counts,
+        'routes': results,
+    }
+
+def print_result(name, result):
+    print(f"{name:16} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  p99 {result['p99_ms']:8.1f}ms  "
+          f"{result['throughput_rps']:8.1f} req/s  {result['queries_per_request'] or 0:5.1f} queries  {result['errors']} errors")
+
+def compare(before_path, after_path):
+    """Prints the p50/p95/throughput change of every route two result files have in common."""
+    with open(before_path) as f:
+        before = json.load(f)['routes']
+    with open(after_path) as f:
+        after = json.load(f)['routes']
+    for name in [name for name in before if name in after]:
+        old, new = before[name], after[name]
+        print(f"{name:16} p50 {old['p50_ms']:8.1f} -> {new['p50_ms']:8.1f}ms  p95 {old['p95_ms']:8.1f} -> {new['p95_ms']:8.1f}ms  "
+              f"{old['throughput_rps']:8.1f} -> {new['throughput_rps']:8.1f} req/s  "
+              f"{old['queries_per_request'] or 0:5.1f} -> {new['queries_per_request'] or 0:5.1f} queries")
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency/throughput of the Fyyur routes (DATABASE_URL picks the database).')
+    parser.add_argument('--mode', choices=('client', 'server'), default='client')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--routes', nargs='*', help=f"only these routes: {' '.join(route[0] for route in ROUTES)}")
+    parser.add_argument('--cache', action='store_true', help='keep the page cache on')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Checks the double booking verdicts of a full /availability batch (MAX_AVAILABILITY_BATCH checks)
+against an artist with a long history of shows, in a new sqlite database.
+
+    python benchmarks/check_availability.py
+
+Exits with status 1 when the request fails or a verdict is wrong.
+"""
+import os
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'availability.db')
+
+from app import app, MAX_AVAILABILITY_BATCH
+from models import db, Venue, Artist, Show
+
+# one show a day at 20:00 for this many days
+SHOWS = 201
+
+def main():
+    # flask_wtf.Form warns on every instantiation
+    warnings.simplefilter('ignore')
+    first = datetime(2030, 1, 1, 20)
+    with app.app_context():
+        db.create_all()
+        venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Jazz'], seeking_venue=True, availability_restriction=False)
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        db.session.add_all([Show(artist_id=artist.id, venue_id=venue.id, start_time=first + timedelta(days=day)) for day in range(SHOWS)])
+        db.session.commit()
+        artist_id, venue_id = artist.id, venue.id
+
+    # an hour into the show of the day (a conflict) for the first SHOWS days, free evenings after that
+    days = [check % (2 * SHOWS) for check in range(MAX_AVAILABILITY_BATCH - 2)]
+    checks = [{'artist_id': artist_id, 'venue_id': venue_id, 'start_time': (first + timedelta(days=day, hours=1)).isoformat()} for day in days]
+    response = app.test_client().post('/availability', json={'checks': checks})
+    if response.status_code != 200:
+        print(f'/availability answered {response.status_code}')
+        sys.exit(1)
+    wrong = [(day, verdict) for day, verdict in zip(days, response.get_json()['checks']) if verdict['valid'] != (day >= SHOWS)]
+    for day, verdict in wrong[:5]:
+        print(f'  day {day}: {verdict}')
+    print(f'{len(checks)} checks, {len(wrong)} wrong verdicts')
+    sys.exit(1 if wrong else 0)
+
+if __name__ == '__main__':
+    main()
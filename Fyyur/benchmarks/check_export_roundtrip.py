@@ -0,0 +1,89 @@
+"""
+Checks that `flask catalog import` reads back what `flask catalog export` writes: exports the venues,
+artists and shows of the database as csv and as json, imports each export into a new sqlite database
+and compares the two catalogs (ids aside, the import hands out new ones).
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/check_export_roundtrip.py
+
+Exits with status 1 when a row is rejected or comes back different.
+"""
+import os
+import sys
+import tempfile
+import warnings
+from datetime import timezone
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import app
+from models import db, Venue, Artist
+from forms import VenueForm, ArtistForm
+from commands import import_entities, import_shows, venue_params, artist_params
+from export import export_text, export_rows, EXPORT_FORMATS
+
+KINDS = ('venues', 'artists', 'shows')
+# ids are handed out again by the import
+IGNORED = {'venues': {'id'}, 'artists': {'id'}, 'shows': {'id', 'artist_id', 'venue_id'}}
+
+def comparable(value):
+    """Values as both databases hold them: sqlite drops the timezone of (utc) timestamps, csv turns None into ''."""
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo') and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def catalog(session, kind):
+    _, rows = export_rows(session, kind)
+    return [{key: comparable(value) for key, value in row.items() if key not in IGNORED[kind]} for row in rows]
+
+def roundtrip(session, directory, format):
+    """Exports the catalog as format, imports it into a new sqlite database, returns the number of problems."""
+    paths = {}
+    for kind in KINDS:
+        paths[kind] = os.path.join(directory, f'{kind}.{format}')
+        with open(paths[kind], 'w', encoding='utf-8', newline='') as f:
+            for chunk in export_text(session, kind, format):
+                f.write(chunk)
+
+    engine = create_engine('sqlite:///' + os.path.join(directory, f'{format}.db'))
+    db.metadata.create_all(engine)
+    problems = 0
+    with Session(engine) as target:
+        venue_map, artist_map = {}, {}
+        reports = [
+            import_entities(target, paths['venues'], Venue, VenueForm, venue_params, 1000, venue_map),
+            import_entities(target, paths['artists'], Artist, ArtistForm, artist_params, 1000, artist_map),
+            import_shows(target, paths['shows'], 1000, artist_map, venue_map),
+        ]
+        for report in reports:
+            report.echo()
+            for rejected in report.rejected[:5]:
+                print(f'  rejected {rejected}')
+            problems += len(report.rejected)
+        for kind in KINDS:
+            before, after = catalog(session, kind), catalog(target, kind)
+            different = [(old, new) for old, new in zip(before, after) if old != new]
+            if len(before) != len(after) or different:
+                print(f'  {kind}: {len(before)} rows exported, {len(after)} imported, {len(different)} differ')
+                for old, new in different[:5]:
+                    print(f'    {old}\n != {new}')
+                problems += abs(len(before) - len(after)) + len(different)
+    return problems
+
+def main():
+    # flask_wtf.Form warns on every instantiation
+    warnings.simplefilter('ignore')
+    problems = 0
+    with app.app_context(), tempfile.TemporaryDirectory() as directory:
+        for format in EXPORT_FORMATS:
+            print(f'{format}:')
+            problems += roundtrip(db.session, directory, format)
+    print('round trip ok' if not problems else f'{problems} problems')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
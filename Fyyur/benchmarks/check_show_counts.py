@@ -0,0 +1,84 @@
+"""
+Checks the incremental upcoming/past show counts (counters.py) against a recount, in a new sqlite database:
+a show deleted after it started, and an artist deleted with all its shows.
+
+    python benchmarks/check_show_counts.py
+
+Exits with status 1 when a count differs from the recount or the delete sends an UPDATE per show.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'counts.db')
+
+from app import app
+from models import db, Venue, Artist, Show
+from counters import reconcile_show_counts
+
+# shows of the deleted artist, spread over two venues
+SHOWS = 201
+
+def counts(session, Model, owner_id):
+    owner = session.get(Model, owner_id)
+    session.refresh(owner)
+    return owner.upcoming_show_count, owner.past_show_count
+
+def main():
+    problems = []
+    with app.app_context():
+        session = db.session
+        db.create_all()
+        venues = [Venue(name=f'Venue {i}', city='San Francisco', state='CA', genres=['Jazz']) for i in range(2)]
+        artists = [Artist(name=f'Artist {i}', city='San Francisco', state='CA', genres=['Jazz'], seeking_venue=True, availability_restriction=False) for i in range(2)]
+        session.add_all(venues + artists)
+        session.commit()
+        reconcile_show_counts(session)
+        venue_id, artist_id, other_artist_id = venues[0].id, artists[0].id, artists[1].id
+
+        # upcoming when inserted, past by the time it is deleted: it leaves the bucket it was counted in
+        show = Show(artist_id=artist_id, venue_id=venue_id, start_time=datetime.now() + timedelta(seconds=1))
+        session.add(show)
+        session.commit()
+        time.sleep(2)
+        session.delete(show)
+        session.commit()
+        for Model, owner_id in ((Venue, venue_id), (Artist, artist_id)):
+            if counts(session, Model, owner_id) != (0, 0):
+                problems.append(f'{Model.__tablename__} {owner_id}: {counts(session, Model, owner_id)} after the show was deleted, expected (0, 0)')
+
+        # an artist with SHOWS shows (half past, half upcoming) deleted through the ORM cascade
+        now = datetime.now()
+        session.add_all([Show(artist_id=other_artist_id, venue_id=venues[day % 2].id, start_time=now + timedelta(days=day - SHOWS // 2, hours=1))
+                         for day in range(SHOWS)])
+        session.commit()
+        statements = []
+        def record(connection, cursor, statement, *args):
+            statements.append(statement)
+        db.event.listen(db.engine, 'before_cursor_execute', record)
+        session.delete(session.get(Artist, other_artist_id))
+        session.commit()
+        db.event.remove(db.engine, 'before_cursor_execute', record)
+        updates = [statement for statement in statements if statement.startswith('UPDATE')]
+        print(f'artist with {SHOWS} shows deleted: {len(statements)} statements, {len(updates)} UPDATEs')
+        if len(updates) > 2:
+            problems.append(f'{len(updates)} UPDATEs to delete one artist, expected one per venue')
+
+        incremental = {(Model, owner.id): counts(session, Model, owner.id) for Model in (Venue, Artist) for owner in session.query(Model)}
+        reconcile_show_counts(session)
+        for (Model, owner_id), value in incremental.items():
+            if counts(session, Model, owner_id) != value:
+                problems.append(f'{Model.__tablename__} {owner_id}: {value} incrementally, {counts(session, Model, owner_id)} recounted')
+
+    for problem in problems:
+        print(f'  {problem}')
+    print('show counts ok' if not problems else f'{len(problems)} problems')
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
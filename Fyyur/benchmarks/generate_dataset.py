@@ -0,0 +1,157 @@
+"""
+Fills the database with a synthetic catalog for the benchmarks.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/generate_dataset.py --venues 2000 --artists 10000 --shows 100000 --create
+
+Genres follow the form choices with a few genres far more common than the rest, venues and artists
+cluster in a handful of big cities, and a few popular artists/venues play most of the shows.
+Shows are spread over a year either side of today in 3 hour evening slots and never double book
+an artist or a venue, so the postgres exclusion constraints accept them.
+Without --create the tables must exist (flask db upgrade) and should be empty, the generated shows
+only avoid each other.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# run from anywhere, the app modules live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db, Venue, Artist, Show, SHOW_DURATION
+from forms import GENRES as FORM_GENRES
+from commands import chunked
+from counters import reconcile_show_counts
+
+GENRES = [value for value, _ in FORM_GENRES]
+# (city, state, weight): most venues and artists are in a few big cities
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 20), ('San Francisco', 'CA', 12), ('Chicago', 'IL', 10),
+    ('Austin', 'TX', 8), ('Nashville', 'TN', 8), ('Seattle', 'WA', 5), ('New Orleans', 'LA', 5),
+    ('Denver', 'CO', 3), ('Portland', 'OR', 3), ('Atlanta', 'GA', 3), ('Boston', 'MA', 3),
+    ('Miami', 'FL', 2), ('Detroit', 'MI', 2), ('Minneapolis', 'MN', 1), ('Memphis', 'TN', 1),
+]
+WORDS = ['Blue', 'Red', 'Golden', 'Silver', 'Velvet', 'Electric', 'Midnight', 'Wild', 'Lonely', 'Neon',
+         'Hollow', 'Iron', 'Crystal', 'Rusty', 'Lucky', 'Broken', 'Royal', 'Paper', 'Black', 'Green']
+VENUE_NOUNS = ['Hall', 'Lounge', 'Room', 'Club', 'Theater', 'Tavern', 'Garden', 'Cellar', 'Ballroom', 'Bar']
+ARTIST_NOUNS = ['Band', 'Kings', 'Riders', 'Sisters', 'Brothers', 'Orchestra', 'Quartet', 'Ghosts', 'Wolves', 'Trio']
+# shows start at these hours (utc), SHOW_DURATION apart so the slots of one day never overlap
+SLOT_HOURS = (15, 18, 21)
+
+def zipf_weights(count, exponent=1.1):
+    """Weights of count items where the first ones are far more popular than the rest."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def pick_genres(rng, genre_weights):
+    genres = set(rng.choices(GENRES, genre_weights, k=rng.choice((1, 1, 2, 2, 3))))
+    return sorted(genres)
+
+def venue_rows(rng, count, genre_weights):
+    city_weights = [weight for _, _, weight in CITIES]
+    for i in range(count):
+        city, state, _ = rng.choices(CITIES, city_weights)[0]
+        seeking = rng.random() < 0.3
+        yield {
+            'name': f'The {rng.choice(WORDS)} {rng.choice(VENUE_NOUNS)} {i}',
+            'city': city, 'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(WORDS)} St',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://example.com/venues/{i}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{i}',
+            'website': f'https://venue{i}.example.com',
+            'genres': pick_genres(rng, genre_weights),
+            'seeking_talent': seeking,
+            'seeking_description': 'Looking for local acts' if seeking else '',
+        }
+
+def artist_rows(rng, count, genre_weights):
+    city_weights = [weight for _, _, weight in CITIES]
+    for i in range(count):
+        city, state, _ = rng.choices(CITIES, city_weights)[0]
+        seeking = rng.random() < 0.4
+        # one artist in ten only plays inside a time window
+        restricted = rng.random() < 0.1
+        from_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(days=rng.randint(0, 365))
+        yield {
+            'name': f'{rng.choice(WORDS)} {rng.choice(ARTIST_NOUNS)} {i}',
+            'city': city, 'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://example.com/artists/{i}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{i}',
+            'website': f'https://artist{i}.example.com',
+            'genres': pick_genres(rng, genre_weights),
+            'seeking_venue': seeking,
+            'seeking_description': 'Looking for shows' if seeking else '',
+            'availability_restriction': restricted,
+            'from_time': from_time if restricted else None,
+            'to_time': from_time + timedelta(days=rng.randint(30, 365)) if restricted else None,
+        }
+
+def show_rows(rng, count, artist_ids, venue_ids):
+    """Shows of popular artists at popular venues, skipping slots the artist or venue already plays."""
+    first_day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+    slots = [(day, hour) for day in range(730) for hour in SLOT_HOURS]
+    artist_weights = zipf_weights(len(artist_ids), 0.8)
+    venue_weights = zipf_weights(len(venue_ids), 0.8)
+    booked = set()
+    made = 0
+    while made < count:
+        artist_ids_batch = rng.choices(artist_ids, artist_weights, k=1000)
+        venue_ids_batch = rng.choices(venue_ids, venue_weights, k=1000)
+        for artist_id, venue_id in zip(artist_ids_batch, venue_ids_batch):
+            slot = rng.choice(slots)
+            if ('artist', artist_id, slot) in booked or ('venue', venue_id, slot) in booked:
+                continue
+            booked.add(('artist', artist_id, slot))
+            booked.add(('venue', venue_id, slot))
+            day, hour = slot
+            start_time = first_day + timedelta(days=day, hours=hour)
+            yield {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time, 'end_time': start_time + SHOW_DURATION}
+            made += 1
+            if made == count:
+                return
+
+def insert(session, table, rows, chunk_size):
+    """Inserts rows chunk by chunk, one executemany and commit per chunk."""
+    for chunk in chunked(rows, chunk_size):
+        session.execute(table.insert(), chunk)
+        session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic Fyyur catalog for the benchmarks (DATABASE_URL picks the database).')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1, help='same seed, same dataset')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--create', action='store_true', help='create the tables first (db.create_all, e.g. for a new sqlite file)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    genre_weights = zipf_weights(len(GENRES))
+    rng.shuffle(genre_weights)
+
+    with app.app_context():
+        session = db.session
+        if args.create:
+            db.create_all()
+        for name, Model, rows in (
+                ('venues', Venue, venue_rows(rng, args.venues, genre_weights)),
+                ('artists', Artist, artist_rows(rng, args.artists, genre_weights))):
+            started = time.perf_counter()
+            insert(session, Model.__table__, rows, args.chunk_size)
+            print(f'{name}: {getattr(args, name)} rows in {time.perf_counter() - started:.1f}s')
+
+        artist_ids = [artist_id for (artist_id,) in session.query(Artist.id)]
+        venue_ids = [venue_id for (venue_id,) in session.query(Venue.id)]
+        started = time.perf_counter()
+        insert(session, Show.__table__, show_rows(rng, args.shows, artist_ids, venue_ids), args.chunk_size)
+        print(f'shows: {args.shows} rows in {time.perf_counter() - started:.1f}s')
+        # the rows were inserted past the ORM events that maintain the show counts
+        reconcile_show_counts(session)
+
+if __name__ == '__main__':
+    main()
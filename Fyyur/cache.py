@@ -0,0 +1,162 @@
+import pickle
+import re
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import request, session, make_response
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class MemoryBackend:
+    """
+    In-process LRU cache with a TTL per entry.
+    Every worker process has its own copy, so invalidations only reach the worker that handled the write
+    (the TTL bounds how stale the other workers can get), use the redis backend to share one cache.
+    """
+
+    # another process (e.g. a flask command) can not reach the entries
+    shared = False
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            # most recently used entries live at the end
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            # evict the least recently used entries
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, *prefixes):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefixes)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def glob_escape(text):
+    """text matched literally by a redis glob pattern (SCAN MATCH), where ? * [ ] and \\ are special."""
+    return re.sub(r'([?*\[\]\\])', r'\\\1', text)
+
+class RedisBackend:
+    """Cache shared by every worker, kept in a (local) redis compatible server. Redis evicts by TTL / its maxmemory policy."""
+
+    shared = True
+
+    namespace = 'fyyur:page:'
+
+    def __init__(self, url):
+        # optional dependency, only needed when CACHE_BACKEND = 'redis'
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(self.namespace + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.namespace + key, ttl, pickle.dumps(value))
+
+    def delete_prefix(self, *prefixes):
+        for prefix in prefixes:
+            keys = list(self.client.scan_iter(match=glob_escape(self.namespace + prefix) + '*'))
+            if keys:
+                self.client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix('')
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCache:
+    """
+    Caches rendered GET pages by path + query string.
+    Configured by CACHE_BACKEND ('memory', 'redis' or None to disable), CACHE_TTL (seconds),
+    CACHE_MAX_ENTRIES (memory backend) and CACHE_REDIS_URL (redis backend).
+    Write handlers call invalidate() with the paths they changed.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_TTL', 300)
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 2048))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = None
+
+    def cached(self, view):
+        """Decorator serving a view from the cache, only successful responses without pending flash messages are stored."""
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            # a pending flash message has to be rendered into the page, so neither serve nor store a cached copy
+            if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            key = request.full_path
+            hit = self.backend.get(key)
+            if hit is not None:
+                body, status, mimetype = hit
+                response = make_response(body, status)
+                response.mimetype = mimetype
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                self.backend.set(key, (response.get_data(), response.status_code, response.mimetype), self.ttl)
+            return response
+        return cached_view
+
+    def invalidate(self, *paths):
+        """Drops every cached variant (query strings, pages) of the given paths, e.g. invalidate('/venues', '/venues/3')."""
+        if self.backend is not None and paths:
+            # request.full_path always ends the path with '?', so '/venues/3?' does not also drop '/venues/31'
+            self.backend.delete_prefix(*(f'{path}?' for path in paths))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def clear_shared(self):
+        """
+        clear() for processes that serve no pages (flask commands): only a shared (redis) cache can be cleared from there.
+        Returns False when the web workers keep their own cache, their pages stay stale for up to ttl seconds.
+        """
+        if self.backend is None:
+            return True
+        if not self.backend.shared:
+            return False
+        self.backend.clear()
+        return True
+
+
+cache = PageCache()
@@ -0,0 +1,260 @@
+import csv
+import json
+import time
+from functools import lru_cache
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField
+from wtforms.fields.core import UnboundField
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, SHOW_DURATION
+from cache import cache
+from export import export_text, EXPORT_FORMATS
+from counters import reconcile_show_counts
+
+# flask catalog ... (registered next to Migrate in app.py)
+catalog_cli = AppGroup('catalog', help='Bulk import/export of artists, venues and shows.')
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+def read_rows(path):
+    """
+    Streams the rows of a .csv file (header row) or a JSON lines file as dictionaries.
+    The json array of `flask catalog export` (one object per line) reads as JSON lines too.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                # genres are comma separated in a csv cell
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(',')]
+                yield row
+        else:
+            for line in f:
+                line = line.strip().rstrip(',')
+                if line and line not in ('[', ']'):
+                    yield json.loads(line)
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@lru_cache(maxsize=None)
+def boolean_fields(Form):
+    """Names of the BooleanFields of a form class."""
+    return frozenset(name for name in dir(Form)
+                     if isinstance(getattr(Form, name), UnboundField) and issubclass(getattr(Form, name).field_class, BooleanField))
+
+def to_formdata(row, Form):
+    """The row as the form POST Form receives on the web, so it can be validated by the same WTForms classes."""
+    booleans = boolean_fields(Form)
+    formdata = MultiDict()
+    for key, value in row.items():
+        # an empty csv cell is a missing (None) value, as in the json export
+        if value is None or value == '':
+            continue
+        # BooleanField only treats 'false' and '' as false, csv cells hold 'True' / 'False'
+        if key in booleans:
+            value = 'true' if str(value).lower() == 'true' else 'false'
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        else:
+            formdata.add(key, str(value))
+    # the csv/json column may use the model name of the website field
+    if 'website' in formdata and 'website_link' not in formdata:
+        formdata['website_link'] = formdata['website']
+    return formdata
+
+#----------------------------------------------------------------------------#
+# Validation (same rules as the web forms).
+#----------------------------------------------------------------------------#
+
+def venue_params(form):
+    """Venue columns from a validated VenueForm, mirrors helpers.get_form_submission_info()."""
+    data = form.data
+    return {'name': data['name'], 'city': data['city'], 'state': data['state'], 'address': data['address'],
+            'phone': data['phone'], 'image_link': data['image_link'], 'facebook_link': data['facebook_link'],
+            'website': data['website_link'], 'genres': data['genres'], 'seeking_talent': data['seeking_talent'],
+            'seeking_description': data['seeking_description']}
+
+def artist_params(form):
+    """Artist columns from a validated ArtistForm, mirrors helpers.get_form_submission_info()."""
+    data = form.data
+    restricted = data['availability_restriction']
+    return {'name': data['name'], 'city': data['city'], 'state': data['state'], 'phone': data['phone'],
+            'image_link': data['image_link'], 'facebook_link': data['facebook_link'], 'website': data['website_link'],
+            'genres': data['genres'], 'seeking_venue': data['seeking_venue'], 'seeking_description': data['seeking_description'],
+            'availability_restriction': restricted,
+            'from_time': data['from_time'] if restricted else None, 'to_time': data['to_time'] if restricted else None}
+
+#----------------------------------------------------------------------------#
+# Inserting.
+#----------------------------------------------------------------------------#
+
+def reserve_ids(session, table, count):
+    """
+    Ids for count new rows of table, so the source id -> database id map is known before the chunk is inserted.
+    Postgres hands them out from the id sequence, other databases (sqlite, single writer) continue after max(id).
+    """
+    if session.bind.dialect.name == 'postgresql':
+        rows = session.execute(db.text(f"SELECT nextval(pg_get_serial_sequence('{table.name}', 'id')) FROM generate_series(1, :count)"), {'count': count})
+        return [row[0] for row in rows]
+    start = session.execute(db.select(db.func.coalesce(db.func.max(table.c.id), 0))).scalar() + 1
+    return list(range(start, start + count))
+
+def insert_chunk(session, table, rows, rejected):
+    """
+    Inserts rows with one executemany (psycopg2 batches it into multi row VALUES).
+    If the chunk violates a constraint (e.g. a double booked show) it is retried row by row and only the offending rows are rejected.
+    Returns the number of inserted rows.
+    """
+    if not rows:
+        return 0
+    try:
+        with session.begin_nested():
+            session.execute(table.insert(), [params for params, _ in rows])
+        return len(rows)
+    except IntegrityError:
+        inserted = 0
+        for params, source in rows:
+            try:
+                with session.begin_nested():
+                    session.execute(table.insert(), params)
+                inserted += 1
+            except IntegrityError as e:
+                rejected.append({'row': source, 'errors': str(e.orig)})
+        return inserted
+
+class Report:
+    """Throughput / rejected rows of one imported file."""
+
+    def __init__(self, name):
+        self.name = name
+        self.read = 0
+        self.inserted = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+
+    def echo(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.read / elapsed if elapsed else 0
+        click.echo(f'{self.name}: {self.inserted} inserted, {len(self.rejected)} rejected of {self.read} rows in {elapsed:.1f}s ({rate:.0f} rows/s)')
+
+def import_entities(session, path, Model, Form, to_params, chunk_size, id_map):
+    """Validates and inserts artists/venues, records source id -> database id in id_map."""
+    report = Report(Model.__tablename__)
+    for chunk in chunked(read_rows(path), chunk_size):
+        report.read += len(chunk)
+        valid = []
+        for row in chunk:
+            form = Form(formdata=to_formdata(row, Form), meta={'csrf': False})
+            if form.validate():
+                valid.append((to_params(form), row))
+            else:
+                report.rejected.append({'row': row, 'errors': form.errors})
+        for (params, row), new_id in zip(valid, reserve_ids(session, Model.__table__, len(valid))):
+            params['id'] = new_id
+            if row.get('id') not in (None, ''):
+                id_map[str(row['id'])] = new_id
+        report.inserted += insert_chunk(session, Model.__table__, valid, report.rejected)
+        session.commit()
+    return report
+
+def resolve_ids(session, Model, source_ids, id_map):
+    """
+    Database ids for the artist/venue references of a chunk of shows: ids imported in this run come from id_map,
+    anything else must already exist in the database (one IN query per chunk).
+    """
+    resolved = {source_id: id_map[source_id] for source_id in source_ids if source_id in id_map}
+    existing = [int(source_id) for source_id in source_ids if source_id not in id_map and source_id.isdigit()]
+    if existing:
+        for (found,) in session.query(Model.id).filter(Model.id.in_(existing)):
+            resolved[str(found)] = found
+    return resolved
+
+def import_shows(session, path, chunk_size, artist_map, venue_map):
+    report = Report(Show.__tablename__)
+    for chunk in chunked(read_rows(path), chunk_size):
+        report.read += len(chunk)
+        artists = resolve_ids(session, Artist, {str(row.get('artist_id')) for row in chunk}, artist_map)
+        venues = resolve_ids(session, Venue, {str(row.get('venue_id')) for row in chunk}, venue_map)
+        valid = []
+        for row in chunk:
+            form = ShowForm(formdata=to_formdata(row, ShowForm), meta={'csrf': False})
+            if not form.validate():
+                report.rejected.append({'row': row, 'errors': form.errors})
+                continue
+            artist_id = artists.get(str(row.get('artist_id')))
+            venue_id = venues.get(str(row.get('venue_id')))
+            if artist_id is None or venue_id is None:
+                report.rejected.append({'row': row, 'errors': 'unknown artist_id or venue_id'})
+                continue
+            start_time = form.start_time.data
+            valid.append(({'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time, 'end_time': start_time + SHOW_DURATION}, row))
+        report.inserted += insert_chunk(session, Show.__table__, valid, report.rejected)
+        session.commit()
+    return report
+
+def clear_page_cache():
+    if not cache.clear_shared():
+        click.echo(f'note: the web workers cache pages in memory (CACHE_BACKEND=memory), '
+                   f'listings can be stale for up to {cache.ttl}s', err=True)
+
+@catalog_cli.command('import')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False), help='venues .csv / .jsonl file')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False), help='artists .csv / .jsonl file')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False), help='shows .csv / .jsonl file, artist_id/venue_id refer to the id column of the imported files (or to existing ids)')
+@click.option('--chunk-size', default=1000, show_default=True, help='rows validated and inserted per statement')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='write the rejected rows and their errors to this JSON lines file')
+def import_catalog(venues, artists, shows, chunk_size, rejects):
+    """Streams a partner catalog into the database, validating every row like the web forms do."""
+    session = db.session
+    venue_map, artist_map = {}, {}
+    reports = []
+    if venues:
+        reports.append(import_entities(session, venues, Venue, VenueForm, venue_params, chunk_size, venue_map))
+    if artists:
+        reports.append(import_entities(session, artists, Artist, ArtistForm, artist_params, chunk_size, artist_map))
+    if shows:
+        reports.append(import_shows(session, shows, chunk_size, artist_map, venue_map))
+        # the chunks were inserted past the ORM events that maintain the show counts
+        reconcile_show_counts(session)
+    # every listing may have changed
+    clear_page_cache()
+
+    for report in reports:
+        report.echo()
+    if rejects:
+        with open(rejects, 'w', encoding='utf-8') as f:
+            for report in reports:
+                for rejected in report.rejected:
+                    f.write(json.dumps({'file': report.name, **rejected}, default=str) + '\n')
+
+@catalog_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='file to write to, stdout by default')
+def export_catalog(kind, format, output):
+    """Streams every venue/artist/show to a file, the same output as /export/<kind>."""
+    for chunk in export_text(db.session, kind, format):
+        output.write(chunk)
+
+@catalog_cli.command('reconcile-counts')
+def reconcile_counts():
+    """Recounts the upcoming/past shows of every venue and artist, run periodically (e.g. hourly from cron)."""
+    started = time.perf_counter()
+    reconcile_show_counts(db.session)
+    # the listings show the counts
+    clear_page_cache()
+    click.echo(f'show counts reconciled in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from models import db, Venue, Artist, Show, ShowCountState
+from schedule import as_aware
+
+#----------------------------------------------------------------------------#
+# Incremental updates.
+#----------------------------------------------------------------------------#
+
+def counted_at(connection):
+    """When the counts were last reconciled, None before the first reconcile_show_counts()."""
+    return connection.execute(db.select(ShowCountState.counted_at).limit(1)).scalar()
+
+def _count_shows(session, flush_context):
+    """
+    Applies the shows inserted / deleted by the flush to the counts of their venues and artists,
+    one UPDATE per affected venue or artist however many of its shows changed.
+    A show is upcoming when it starts after the last reconcile, the rule the counts were computed with,
+    so a show deleted after it started leaves the bucket it was counted in.
+    """
+    inserted = [show for show in session.new if isinstance(show, Show)]
+    deleted = [show for show in session.deleted if isinstance(show, Show)]
+    if not inserted and not deleted:
+        return
+    connection = session.connection()
+    since = as_aware(counted_at(connection) or datetime.now(timezone.utc))
+    # venues / artists deleted by the same flush (with their shows) have nothing left to count
+    gone = {(type(owner), owner.id) for owner in session.deleted if isinstance(owner, (Venue, Artist))}
+    deltas = {}
+    for shows, delta in ((inserted, 1), (deleted, -1)):
+        for show in shows:
+            if show.start_time is None:
+                continue
+            column = 'upcoming_show_count' if as_aware(show.start_time) > since else 'past_show_count'
+            for Model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+                if owner_id is not None and (Model, owner_id) not in gone:
+                    counts = deltas.setdefault((Model, owner_id), {'upcoming_show_count': 0, 'past_show_count': 0})
+                    counts[column] += delta
+    for (Model, owner_id), counts in deltas.items():
+        table = Model.__table__
+        values = {column: table.c[column] + delta for column, delta in counts.items() if delta}
+        if values:
+            connection.execute(table.update().where(table.c.id == owner_id).values(values))
+
+# ORM flushes only: bulk inserts (flask catalog import, benchmarks/generate_dataset.py) run reconcile_show_counts() afterwards
+db.event.listen(Session, 'after_flush', _count_shows)
+
+#----------------------------------------------------------------------------#
+# Reconciling.
+#----------------------------------------------------------------------------#
+
+def reconcile_show_counts(session, now=None):
+    """
+    Recounts upcoming/past shows of every venue and artist, one UPDATE per table whose correlated counts
+    are range scans of the (venue_id/artist_id, start_time) indexes.
+    Run periodically (flask catalog reconcile-counts): shows that started since the last run move from upcoming to past,
+    and writes that bypassed the ORM events are picked up. The time of the run is kept in show_count_state.
+    """
+    now = now or datetime.now(timezone.utc)
+    # the incremental updates classify shows against this time until the next run
+    if not session.execute(db.update(ShowCountState).values(counted_at=now)).rowcount:
+        session.add(ShowCountState(counted_at=now))
+    for Model, owner in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        upcoming = db.select(db.func.count(Show.id)).where(owner == Model.id, Show.start_time > now).scalar_subquery()
+        past = db.select(db.func.count(Show.id)).where(owner == Model.id, Show.start_time <= now).scalar_subquery()
+        session.execute(db.update(Model).values(upcoming_show_count=upcoming, past_show_count=past)
+                        .execution_options(synchronize_session=False))
+    session.commit()
@@ -0,0 +1,55 @@
+from models import Venue, Artist, Show
+from queries import show_rows
+from helpers import upcoming_past_shows
+
+# the keys upcoming_past_shows() adds next to the artist/venue columns
+SHOW_FIELDS = ('upcoming_shows', 'upcoming_shows_count', 'past_shows', 'past_shows_count', 'past_page', 'has_older_past_shows')
+
+class Detail:
+    """
+    Read only view of a venue/artist page: the columns the template shows plus its upcoming/past shows.
+    Built from plain column selects, so no ORM instance (and no session identity map) is referenced while
+    the template renders. Slots keep instances small, to_dict() serialises them.
+    """
+    __slots__ = ()
+    # set by the subclasses: the selected columns (the slot names are their keys) and the Show column owning the shows
+    columns = ()
+    owner = None
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def load(cls, session, entity_id, past_page=1, now=None):
+        """The detail of entity_id with one page of past shows, None if it does not exist."""
+        row = session.query(*cls.columns).filter(cls.columns[0] == entity_id).first()
+        if row is None:
+            return None
+        shows = show_rows(session).filter(cls.owner == entity_id)
+        return cls(**row._asdict(), **upcoming_past_shows(shows, now, past_page))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.id} {self.name!r}>'
+
+
+VENUE_COLUMNS = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone, Venue.image_link,
+                 Venue.facebook_link, Venue.website, Venue.genres, Venue.seeking_talent, Venue.seeking_description)
+
+class VenueDetail(Detail):
+    __slots__ = tuple(column.key for column in VENUE_COLUMNS) + SHOW_FIELDS
+    columns = VENUE_COLUMNS
+    owner = Show.venue_id
+
+
+ARTIST_COLUMNS = (Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.image_link, Artist.facebook_link,
+                  Artist.website, Artist.genres, Artist.seeking_venue, Artist.seeking_description,
+                  Artist.availability_restriction, Artist.from_time, Artist.to_time)
+
+class ArtistDetail(Detail):
+    __slots__ = tuple(column.key for column in ARTIST_COLUMNS) + SHOW_FIELDS
+    columns = ARTIST_COLUMNS
+    owner = Show.artist_id
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import datetime
+from models import Show
+from queries import show_rows
+from helpers import provide_min_show
+# the columns of the detail pages are the exported ones
+from details import VENUE_COLUMNS, ARTIST_COLUMNS
+
+# rows fetched per round trip from the server side cursor
+EXPORT_BATCH_SIZE = 1000
+# the generators hand out text in pieces of about this size instead of one per row
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'json': 'application/json'}
+
+# show id plus the denormalised artist/venue fields of provide_min_show()
+SHOW_FIELDS = ('id', 'start_time', 'artist_id', 'artist_name', 'artist_image_link', 'venue_id', 'venue_name', 'venue_image_link')
+
+def export_rows(session, kind):
+    """
+    Returns (field names, iterator of row dictionaries) for 'venues', 'artists' or 'shows', ordered by id.
+    The rows are streamed from a server side cursor EXPORT_BATCH_SIZE at a time, memory does not grow with the table.
+    """
+    if kind == 'shows':
+        query = show_rows(session).order_by(Show.id)
+        rows = ({'id': row.id, **provide_min_show(row)} for row in query.yield_per(EXPORT_BATCH_SIZE))
+        return SHOW_FIELDS, rows
+    columns = VENUE_COLUMNS if kind == 'venues' else ARTIST_COLUMNS
+    query = session.query(*columns).order_by(columns[0])
+    return [column.key for column in columns], (row._asdict() for row in query.yield_per(EXPORT_BATCH_SIZE))
+
+def _csv_value(value):
+    # lists (genres) as one comma separated cell, the way `flask catalog import` reads them back
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value)} is not JSON serializable')
+
+def _buffered(pieces):
+    """Joins small pieces of text into EXPORT_CHUNK_SIZE sized ones."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _csv_lines(fields, rows):
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: _csv_value(value) for key, value in row.items()})
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    # the header when there were no rows
+    yield line.getvalue()
+
+def _json_lines(rows):
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(row, default=_json_default)
+        separator = ',\n'
+    yield '\n]\n'
+
+def export_text(session, kind, format='csv'):
+    """Generator of the export of kind ('venues', 'artists', 'shows') as csv or a json array, in EXPORT_CHUNK_SIZE pieces."""
+    fields, rows = export_rows(session, kind)
+    lines = _csv_lines(fields, rows) if format == 'csv' else _json_lines(rows)
+    return _buffered(lines)
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+import dateutil.parser
+from babel import Locale
+from babel.dates import parse_pattern
+
+# babel patterns of the named formats the templates use ({{ value|datetime('full') }})
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+# bound of the formatted output cache, a listing page renders one timestamp per show
+FORMAT_CACHE_SIZE = 16384
+
+LOCALE = Locale.parse('en')
+
+@lru_cache(maxsize=None)
+def get_pattern(format):
+    """Parsed babel pattern, babel.dates.format_datetime() would parse the pattern string again on every call."""
+    return parse_pattern(DATETIME_FORMATS.get(format, format))
+
+def parse_datetime(value):
+    """Iso strings go through the fast datetime.fromisoformat(), anything else falls back to dateutil."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value)
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _format_datetime(value, format):
+    date = parse_datetime(value)
+    # babel treats naive datetimes as utc
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return get_pattern(format).apply(date, LOCALE)
+
+def format_datetime(value, format='medium'):
+    """
+    Jinja filter formatting a datetime (or a date string) with a named or babel pattern.
+    The output is memoized per (value, format), datetimes are keyed by their iso string so the utc offset is part of the key.
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return _format_datetime(value, format)
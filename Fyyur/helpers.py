@@ -1,7 +1,10 @@
 from functools import wraps
 from flask import request, session, redirect, flash
-from datetime import datetime
-from forms import ArtistForm, VenueForm
+from datetime import datetime, timezone
+from forms import ArtistForm, VenueForm, GENRE_NAMES
+from queries import upcoming_shows, past_shows
+from models import Show
+from schedule import within_availability
 
 def get_form_submission_info(func):
     # save original information from function being decorated 
@@ -28,10 +31,8 @@ def get_form_submission_info(func):
             result_params['availability_restriction'] = form.availability_restriction.data 
             if result_params.get('availability_restriction'):
                 try:
-                    result_params['from_time'] = request.form.get('from_time');
-                    datetime.fromisoformat(result_params['from_time'])
-                    result_params['to_time'] = request.form.get('to_time');
-                    datetime.fromisoformat(result_params['to_time'])
+                    result_params['from_time'] = datetime.fromisoformat(request.form.get('from_time'))
+                    result_params['to_time'] = datetime.fromisoformat(request.form.get('to_time'))
                 except ValueError:
                     flash('Did not provide a proper iso format date')
                     return redirect(f'/artists')
@@ -48,63 +49,110 @@ def get_form_submission_info(func):
         return func(*args, **kwargs)
     return form_info_wrapper
 
-def upcoming_past_shows(data, shows):
+# past shows only grow with time, so the detail pages show them a page at a time (latest first)
+PAST_SHOWS_PER_PAGE = 12
+
+def upcoming_past_shows(shows, now=None, past_page=1):
     """
-    Modified the given dictionary to contain upcming/past shows (and count) keys.
-    Compares the show start time to current time of the user visiting the page.
-    If the show has a greater time then it will be placed in upcoming.
-    It the show is lower then it will be placed in past.
-    ISO formatting is used.
+    Returns the upcoming/past shows (and count) keys of a venue/artist page.
+    shows is a queries.show_rows() query filtered to the Artist/Venue, the upcoming/past split is done by the database.
+    The clock is read once, a show starting after now is upcoming, every other show is past.
+    Only one page of past shows (latest first) is fetched, past_shows_count still holds the total.
     """
-    upcoming = [provide_min_show(show) for show in shows if datetime.fromisoformat(show.start_time) > datetime.now()]
-    past = [provide_min_show(show) for show in shows if datetime.fromisoformat(show.start_time) < datetime.now()] 
-    # added properties that are not in the model (Artist or Venue) itself.
-    data['upcoming_shows_count'] = len(upcoming)
-    data['upcoming_shows'] = upcoming
-    data['past_shows_count'] = len(past)
-    data['past_shows'] = past
+    now = now or datetime.now(timezone.utc)
+    upcoming = [provide_min_show(show) for show in upcoming_shows(shows, now)]
+    offset = (past_page - 1) * PAST_SHOWS_PER_PAGE
+    # one extra row tells whether older shows exist without fetching them
+    past = past_shows(shows, now).offset(offset).limit(PAST_SHOWS_PER_PAGE + 1).all()
+    has_older = len(past) > PAST_SHOWS_PER_PAGE
+    if offset or has_older:
+        past_count = past_shows(shows, now).order_by(None).count()
+    else:
+        # the whole history fit in the first page
+        past_count = len(past)
+    # properties that are not in the model (Artist or Venue) itself.
+    return {
+        'upcoming_shows_count': len(upcoming),
+        'upcoming_shows': upcoming,
+        'past_shows_count': past_count,
+        'past_shows': [provide_min_show(show) for show in past[:PAST_SHOWS_PER_PAGE]],
+        'past_page': past_page,
+        'has_older_past_shows': has_older
+    }
 
 def provide_min_show(show):
     """ 
     Provides minimal information about a certain show.
+    - show is a row of queries.show_rows(), which already holds the artist/venue columns.
     - formatting inspired by the data given in starter code.
     """
-    return {'artist_image_link': show.artist.image_link, 'start_time': show.start_time, 'artist_id': show.artist.id, 'artist_name': show.artist.name, 'venue_id': show.venue.id, 'venue_name': show.venue.name, 'venue_image_link': show.venue.image_link}
+    return {'artist_image_link': show.artist_image_link, 'start_time': show.start_time, 'artist_id': show.artist_id, 'artist_name': show.artist_name, 'venue_id': show.venue_id, 'venue_name': show.venue_name, 'venue_image_link': show.venue_image_link}
+
+def listing_filters(args):
+    """
+    The genre / city / state filters of a listing request (?genre=Jazz&state=NY&city=New York), only the provided ones.
+    Raises ValueError for a genre or state outside the form choices.
+    """
+    filters = {key: args.get(key).strip() for key in ('genre', 'city', 'state') if args.get(key, '').strip()}
+    if 'genre' in filters and filters['genre'] not in GENRE_NAMES:
+        raise ValueError(f"unknown genre: {filters['genre']}")
+    if 'state' in filters:
+        # the state choices are upper case codes
+        filters['state'] = filters['state'].upper()
+        if not (len(filters['state']) == 2 and filters['state'].isalpha()):
+            raise ValueError(f"invalid state: {filters['state']}")
+    return filters
 
-def get_search_result(search_term, session, Model):
+def venue_pages(session, venue_id):
+    """Paths of the cached pages that display the venue: its own page and the pages of the artists playing there."""
+    artist_ids = session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    return [f'/venues/{venue_id}'] + [f'/artists/{artist_id}' for artist_id, in artist_ids]
+
+def artist_pages(session, artist_id):
+    """Paths of the cached pages that display the artist: its own page and the pages of the venues it plays at."""
+    venue_ids = session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    return [f'/artists/{artist_id}'] + [f'/venues/{venue_id}' for venue_id, in venue_ids]
+
+def availability_info(artist, artist_id):
     """
-    Model = Artist / Venue
-    Queries through all possible Model items. First gets a general query, which is a query that contains a word in the search term, then attempts to minimize the search but looking for more terms in the general query.
+    Availability restriction information of an artist, the message /artists/<id>/get_availability sends back.
+    artist may be None (the id does not exist).
     """
-    # will be returned with possible data
-    response = None
-    if search_term:
-        general_query = None
-        # split the search_terms by spaces
-        terms = search_term.split(' ')
-        for term in terms:
-            term = f'%{term}%'
-            if general_query:
-                # get a more specific search result
-                temp = general_query.filter(Model.name.ilike(term))
-                if temp.first():
-                    general_query = temp
-            else:
-                # get a generic search
-                temp = session.query(Model).filter(Model.name.ilike(term))
-                if temp.first():
-                    general_query = temp
+    message = {'exist': True, 'id': artist_id, 'available': True}
+    if not artist:
+        message['exist'] = False
+        return message
+    # check whether the artist is available for booking
+    if not artist.seeking_venue:
+        message['available'] = False
+        return message
+    if artist.availability_restriction:
+        message['restriction'] = True
+        message['from_time'] = artist.from_time.isoformat(sep=' ')
+        message['to_time'] = artist.to_time.isoformat(sep=' ')
+    else:
+        message['restriction'] = False
+    return message
 
-        if general_query:
-            response = {}
-            # populating data key with array of results from search
-            response['data']  = general_query.all()
-            # formating the populated data
-            response['data'] = [
-                    {'id': venue.id, 
-                    'name': venue.name, 
-                    'num_upcoming_shows': len(venue.shows)
-                    } for venue in response.get('data')]
-            # setting count of search result
-            response['count'] = len(response.get('data'))
-    return response 
+def booking_verdict(artist, venue_exists, start_time, conflict=None):
+    """
+    Whether a show of the artist at start_time (iso string) can be booked, with the reason when it can not.
+    venue_exists is None when no venue was asked about.
+    conflict is what schedule.find_conflicts found for the booking ('artist', 'venue' or None).
+    Uses the same rules as create_show_submission.
+    """
+    if not artist:
+        return {'valid': False, 'reason': 'artist does not exist'}
+    if venue_exists is False:
+        return {'valid': False, 'reason': 'venue does not exist'}
+    if not artist.seeking_venue:
+        return {'valid': False, 'reason': 'artist is not available for booking'}
+    try:
+        start_time = datetime.fromisoformat(start_time)
+    except (TypeError, ValueError):
+        return {'valid': False, 'reason': 'start_time is not an iso format date'}
+    if not within_availability(artist, start_time):
+        return {'valid': False, 'reason': 'start_time does not meet the artist availability restriction'}
+    if conflict:
+        return {'valid': False, 'reason': f'the {conflict} already has a show at that time'}
+    return {'valid': True}
@@ -0,0 +1,28 @@
+"""empty message
+
+Revision ID: 5e2a9c7d1b40
+Revises: 1623a28c7fe5
+Create Date: 2021-04-12 09:14:51.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c7d1b40'
+down_revision = '1623a28c7fe5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # start_time was stored as an iso formatted string, postgres can cast those directly
+    op.alter_column('shows', 'start_time', postgresql_using='start_time::timestamp with time zone', existing_type=sa.String(), type_=sa.DateTime(timezone=True))
+    op.create_index(op.f('ix_shows_start_time'), 'shows', ['start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_shows_start_time'), table_name='shows')
+    # back to the iso format the string column used to hold
+    op.alter_column('shows', 'start_time', postgresql_using="to_char(start_time, 'YYYY-MM-DD HH24:MI:SS')", existing_type=sa.DateTime(timezone=True), type_=sa.String())
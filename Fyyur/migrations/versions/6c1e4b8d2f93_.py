@@ -0,0 +1,39 @@
+"""empty message
+
+Revision ID: 6c1e4b8d2f93
+Revises: d5f19b7e3a46
+Create Date: 2021-04-23 10:12:45.118306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1e4b8d2f93'
+down_revision = 'd5f19b7e3a46'
+branch_labels = None
+depends_on = None
+
+# recounts as of now(), the time recorded in show_count_state (same statement as counters.reconcile_show_counts())
+BACKFILL = """
+UPDATE {table} SET
+    upcoming_show_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time > now()),
+    past_show_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time <= now())
+"""
+
+
+def upgrade():
+    # when the show counts were last recounted, the incremental updates classify shows against it
+    op.create_table('show_count_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('counted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO show_count_state (counted_at) VALUES (now())')
+    for table, owner in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(BACKFILL.format(table=table, owner=owner))
+
+
+def downgrade():
+    op.drop_table('show_count_state')
@@ -0,0 +1,54 @@
+"""empty message
+
+Revision ID: 8b31f0e6c2d7
+Revises: 5e2a9c7d1b40
+Create Date: 2021-04-13 08:41:07.915624
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b31f0e6c2d7'
+down_revision = '5e2a9c7d1b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('artist_id', sa.Integer(), nullable=True))
+    op.add_column('shows', sa.Column('venue_id', sa.Integer(), nullable=True))
+    # every show had exactly one row in each bridge table, copy it over before the bridges are dropped
+    op.execute('UPDATE shows SET artist_id = artist_show.artist_id FROM artist_show WHERE artist_show.show_id = shows.id')
+    op.execute('UPDATE shows SET venue_id = venue_show.venue_id FROM venue_show WHERE venue_show.show_id = shows.id')
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'artists', ['artist_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'venues', ['venue_id'], ['id'], ondelete='CASCADE')
+    # (artist_id, start_time) serves both the foreign key lookup and "upcoming shows of this artist" ordered by time
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.drop_table('artist_show')
+    op.drop_table('venue_show')
+
+
+def downgrade():
+    op.create_table('artist_show',
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.Column('show_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+    sa.ForeignKeyConstraint(['show_id'], ['shows.id'], )
+    )
+    op.create_table('venue_show',
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.Column('show_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['show_id'], ['shows.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], )
+    )
+    op.execute('INSERT INTO artist_show (artist_id, show_id) SELECT artist_id, id FROM shows WHERE artist_id IS NOT NULL')
+    op.execute('INSERT INTO venue_show (venue_id, show_id) SELECT venue_id, id FROM shows WHERE venue_id IS NOT NULL')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_constraint('shows_venue_id_fkey', 'shows', type_='foreignkey')
+    op.drop_constraint('shows_artist_id_fkey', 'shows', type_='foreignkey')
+    op.drop_column('shows', 'venue_id')
+    op.drop_column('shows', 'artist_id')
@@ -0,0 +1,29 @@
+"""empty message
+
+Revision ID: 9f3a7c5e1d28
+Revises: 6c1e4b8d2f93
+Create Date: 2021-04-24 16:37:02.904415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3a7c5e1d28'
+down_revision = '6c1e4b8d2f93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the city filter compares lower(city), a plain (state, city) index can not serve it
+    for table in ('venues', 'artists'):
+        op.drop_index(f'ix_{table}_state_city', table_name=table)
+        op.create_index(f'ix_{table}_state_lower_city', table, ['state', sa.text('lower(city)')], unique=False)
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_index(f'ix_{table}_state_lower_city', table_name=table)
+        op.create_index(f'ix_{table}_state_city', table, ['state', 'city'], unique=False)
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: a3d8e5c1f072
+Revises: e91b6f3a4c25
+Create Date: 2021-04-16 09:41:12.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d8e5c1f072'
+down_revision = 'e91b6f3a4c25'
+branch_labels = None
+depends_on = None
+
+# backfills the counts, the same statement as counters.reconcile_show_counts()
+BACKFILL = """
+UPDATE {table} SET
+    upcoming_show_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time > now()),
+    past_show_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time <= now())
+"""
+
+
+def upgrade():
+    # denormalised show counts, the listings and the search read them instead of counting shows
+    for table, owner in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(BACKFILL.format(table=table, owner=owner))
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_show_count')
+        op.drop_column(table, 'upcoming_show_count')
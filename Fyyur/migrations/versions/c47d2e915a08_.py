@@ -0,0 +1,28 @@
+"""empty message
+
+Revision ID: c47d2e915a08
+Revises: 8b31f0e6c2d7
+Create Date: 2021-04-14 10:02:33.418560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d2e915a08'
+down_revision = '8b31f0e6c2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # trigram GIN indexes let the search's name ILIKE '%term%' filters (and similarity ranking) use an index
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_venues_name_trgm', table_name='venues')
+    op.drop_index('ix_artists_name_trgm', table_name='artists')
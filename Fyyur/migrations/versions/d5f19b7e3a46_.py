@@ -0,0 +1,32 @@
+"""empty message
+
+Revision ID: d5f19b7e3a46
+Revises: a3d8e5c1f072
+Create Date: 2021-04-17 14:05:51.772904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f19b7e3a46'
+down_revision = 'a3d8e5c1f072'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN indexes answer the genre filter (genres @> ARRAY['Jazz']) without a sequential scan
+    op.create_index('ix_venues_genres', 'venues', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artists_genres', 'artists', ['genres'], unique=False, postgresql_using='gin')
+    # state / state + city filters of the listings
+    op.create_index('ix_venues_state_city', 'venues', ['state', 'city'], unique=False)
+    op.create_index('ix_artists_state_city', 'artists', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artists_state_city', table_name='artists')
+    op.drop_index('ix_venues_state_city', table_name='venues')
+    op.drop_index('ix_artists_genres', table_name='artists')
+    op.drop_index('ix_venues_genres', table_name='venues')
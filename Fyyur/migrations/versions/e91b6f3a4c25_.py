@@ -0,0 +1,49 @@
+"""empty message
+
+Revision ID: e91b6f3a4c25
+Revises: c47d2e915a08
+Create Date: 2021-04-15 11:26:48.203977
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91b6f3a4c25'
+down_revision = 'c47d2e915a08'
+branch_labels = None
+depends_on = None
+
+# pairs of shows of the same artist (or venue) whose time ranges overlap, the exclusion constraints can not be added while any exist
+OVERLAPPING_SHOWS = """
+SELECT count(*) FROM shows a JOIN shows b ON a.id < b.id
+    AND (a.artist_id = b.artist_id OR a.venue_id = b.venue_id)
+    AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)
+"""
+
+
+def upgrade():
+    # availability windows become typed timestamps (they were iso strings), checks no longer parse them
+    op.alter_column('artists', 'from_time', postgresql_using="NULLIF(from_time, '')::timestamp with time zone", existing_type=sa.String(), type_=sa.DateTime(timezone=True))
+    op.alter_column('artists', 'to_time', postgresql_using="NULLIF(to_time, '')::timestamp with time zone", existing_type=sa.String(), type_=sa.DateTime(timezone=True))
+
+    # shows get an end, (start_time + interval) is not immutable so postgres can not index the range without the column
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE shows SET end_time = start_time + interval '3 hours'")
+
+    overlapping = op.get_bind().execute(sa.text(OVERLAPPING_SHOWS)).scalar()
+    if overlapping:
+        raise RuntimeError(f'{overlapping} pairs of shows double book an artist or a venue, reschedule or delete them before upgrading.')
+    # btree_gist lets the integer ids take part in a GiST exclusion constraint
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_artist_id_no_overlap EXCLUDE USING gist (artist_id WITH =, tstzrange(start_time, end_time) WITH &&) WHERE (start_time IS NOT NULL)')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_venue_id_no_overlap EXCLUDE USING gist (venue_id WITH =, tstzrange(start_time, end_time) WITH &&) WHERE (start_time IS NOT NULL)')
+
+
+def downgrade():
+    op.drop_constraint('shows_venue_id_no_overlap', 'shows')
+    op.drop_constraint('shows_artist_id_no_overlap', 'shows')
+    op.drop_column('shows', 'end_time')
+    op.alter_column('artists', 'to_time', postgresql_using="to_char(to_time, 'YYYY-MM-DD HH24:MI:SS')", existing_type=sa.DateTime(timezone=True), type_=sa.String())
+    op.alter_column('artists', 'from_time', postgresql_using="to_char(from_time, 'YYYY-MM-DD HH24:MI:SS')", existing_type=sa.DateTime(timezone=True), type_=sa.String())
@@ -1,17 +1,27 @@
+from datetime import timedelta
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql
 db = SQLAlchemy()
 
+# how long a show occupies its artist and venue, used to detect double bookings
+SHOW_DURATION = timedelta(hours=3)
+
+class StringArray(db.TypeDecorator):
+    """
+    A postgres ARRAY of strings (genres), stored as a JSON list on other databases so the app also runs on a local sqlite file.
+    """
+    impl = postgresql.ARRAY(db.String)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.ARRAY(db.String))
+        return dialect.type_descriptor(db.JSON())
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
-# creates a many-to-many relationship between a venue and show
-venue_show_bridge = db.Table('venue_show', db.Column('venue_id', db.Integer, db.ForeignKey(
-    'venues.id')), db.Column('show_id', db.Integer, db.ForeignKey('shows.id')))
-# creates a many-to-many relationship between an artist and a show
-artist_show_bridge = db.Table('artist_show', db.Column('artist_id', db.Integer, db.ForeignKey(
-    'artists.id')), db.Column('show_id', db.Integer, db.ForeignKey('shows.id')))
-
 class Venue(db.Model):
     __tablename__ = 'venues'
 
@@ -23,14 +33,23 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(StringArray)
 
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     website = db.Column(db.String(120))
 
-    shows = db.relationship('Show', secondary=venue_show_bridge, backref=db.backref(
-        'venue', lazy=True, uselist=False), cascade='all, delete')
+    shows = db.relationship('Show', backref=db.backref('venue', lazy=True), cascade='all, delete')
+
+    # denormalised show counts, kept up to date by counters.py
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # genre (GIN, serves genres @> ARRAY[...]) and state/city (case insensitive) filters of the listing
+    __table_args__ = (
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venues_state_lower_city', 'state', db.func.lower(city)),
+    )
 
 
 class Artist(db.Model):
@@ -41,7 +60,7 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(StringArray)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
@@ -49,20 +68,44 @@ class Artist(db.Model):
     seeking_description = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean)
 
-    shows = db.relationship('Show', secondary=artist_show_bridge, backref=db.backref(
-        'artist', lazy=True, uselist=False), cascade='all, delete')
+    shows = db.relationship('Show', backref=db.backref('artist', lazy=True), cascade='all, delete')
+
+    # denormalised show counts, kept up to date by counters.py
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # availability restriction 
     availability_restriction = db.Column(db.Boolean, nullable=False)
-    to_time = db.Column(db.String)
-    from_time = db.Column(db.String)
+    to_time = db.Column(db.DateTime(timezone=True))
+    from_time = db.Column(db.DateTime(timezone=True))
+
+    # genre (GIN, serves genres @> ARRAY[...]) and state/city (case insensitive) filters of the listing
+    __table_args__ = (
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artists_state_lower_city', 'state', db.func.lower(city)),
+    )
 
 class Show(db.Model):
     __tablename__ = 'shows'
 
     id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.String)
-    # artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-    # venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
+    # timezone aware timestamp, indexed so upcoming/past filters (start_time > now) are range scans
+    start_time = db.Column(db.DateTime(timezone=True), index=True)
+    # on postgres, exclusion constraints reject shows whose [start_time, end_time) overlaps another show of the same artist/venue
+    end_time = db.Column(db.DateTime(timezone=True), default=lambda context: context.get_current_parameters()['start_time'] + SHOW_DURATION)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'))
+
+    # (foreign key, start_time) indexes serve both the join and "upcoming shows of this artist/venue" ordered by time
+    __table_args__ = (
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    )
 
 
+class ShowCountState(db.Model):
+    """A single row: when counters.reconcile_show_counts() last recounted the shows of every venue and artist."""
+    __tablename__ = 'show_count_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    counted_at = db.Column(db.DateTime(timezone=True), nullable=False)
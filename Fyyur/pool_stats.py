@@ -0,0 +1,118 @@
+import logging
+import time
+from collections import deque
+from threading import Lock
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger('fyyur.pool')
+
+# checkout latencies kept for the percentiles of /_stats/db
+LATENCY_SAMPLES = 1000
+
+class PoolStats:
+    """
+    Connection pool counters of this worker process: checkout latency, checkouts that had to wait for a free
+    connection, timeouts, connections opened/invalidated. Filled by InstrumentedQueuePool and the pool events.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.slow_checkout = 0.1
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidated = 0
+            self.checkout_time = 0.0
+            self.max_checkout = 0.0
+            self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_checkout(self, elapsed, waited):
+        with self.lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.checkout_time += elapsed
+            self.max_checkout = max(self.max_checkout, elapsed)
+            self.latencies.append(elapsed)
+        if elapsed >= self.slow_checkout:
+            logger.warning('waited %.1fms for a database connection', elapsed * 1000)
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+        logger.error('timed out waiting for a database connection')
+
+    def record_connect(self, *args):
+        with self.lock:
+            self.connects += 1
+
+    def record_invalidate(self, *args):
+        with self.lock:
+            self.invalidated += 1
+
+    def snapshot(self, pool):
+        """The counters plus the current state of pool as a JSON-able dictionary (times in ms)."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidated': self.invalidated,
+                'checkout_ms': {
+                    'mean': self.checkout_time / self.checkouts * 1000 if self.checkouts else 0,
+                    'p50': _percentile(latencies, 0.5) * 1000,
+                    'p95': _percentile(latencies, 0.95) * 1000,
+                    'max': self.max_checkout * 1000,
+                },
+            }
+        # only a QueuePool keeps track of its connections (sqlite runs on a NullPool/SingletonThreadPool)
+        if isinstance(pool, QueuePool):
+            stats['pool'] = {'size': pool.size(), 'in_use': pool.checkedout(), 'idle': pool.checkedin(), 'overflow': pool.overflow()}
+        else:
+            stats['pool'] = {'class': type(pool).__name__}
+        return stats
+
+    def init_app(self, app, engine):
+        self.slow_checkout = app.config.get('DB_POOL_SLOW_CHECKOUT_MS', 100) / 1000
+        event.listen(engine, 'connect', self.record_connect)
+        event.listen(engine, 'invalidate', self.record_invalidate)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool timing every checkout into pool_stats, configured as the poolclass in config.py.
+    Only public pool API is used: connect() (what the engine calls for a connection) and checkedin()/overflow().
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        # QueuePool keeps it private, -1 means no limit
+        self.max_overflow = max_overflow
+
+    def connect(self):
+        # the checkout has to wait when no connection is idle and no overflow connection may be opened
+        waited = self.checkedin() == 0 and 0 <= self.max_overflow <= self.overflow()
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_stats.record_timeout()
+            raise
+        pool_stats.record_checkout(time.perf_counter() - started, waited)
+        return connection
@@ -0,0 +1,152 @@
+import heapq
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock, local
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+logger = logging.getLogger('fyyur.queries')
+
+# slowest statements kept per endpoint for the report
+SLOWEST_STATEMENTS = 5
+# statements are cut to this length in the report / error messages
+STATEMENT_LENGTH = 500
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by QueryProfiler.budget() when the block ran more queries than allowed."""
+
+
+class EndpointStats:
+    """Queries of every profiled request of one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        # min heap of (duration, statement), the slowest statements survive
+        self.slowest = []
+
+    def add(self, count, db_time, statements):
+        self.requests += 1
+        self.queries += count
+        self.max_queries = max(self.max_queries, count)
+        self.db_time += db_time
+        for entry in statements:
+            if len(self.slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'queries_per_request': self.queries / self.requests,
+            'max_queries': self.max_queries,
+            'db_ms_per_request': self.db_time / self.requests * 1000,
+            'slowest': [{'ms': duration * 1000, 'statement': statement} for duration, statement in sorted(self.slowest, reverse=True)],
+        }
+
+
+class QueryProfiler:
+    """
+    Counts the queries (and their time) of every request through the engine's cursor events.
+    Enabled by QUERY_PROFILER: the counts are aggregated per endpoint for report(), sent back as
+    X-Query-Count / X-Query-Time-Ms headers in debug mode, statements slower than QUERY_PROFILER_SLOW_MS are logged.
+    budget() works without QUERY_PROFILER and is meant for tests, e.g.
+        with profiler.budget(2):
+            client.get('/venues')
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.enabled = False
+        self.headers = False
+        self.slow = 0.1
+        self.endpoints = {}
+        self.lock = Lock()
+        # active budgets of the current thread
+        self.budgets = local()
+
+    def init_app(self, app, engine):
+        self.engine = engine
+        self.enabled = app.config.get('QUERY_PROFILER', False)
+        if not self.enabled:
+            return
+        self.headers = app.debug
+        self.slow = app.config.get('QUERY_PROFILER_SLOW_MS', 100) / 1000
+        self._listen()
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+
+    def _listen(self):
+        if not event.contains(self.engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    #  Cursor events
+    #  ----------------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        statement = statement[:STATEMENT_LENGTH]
+        for budget in getattr(self.budgets, 'active', ()):
+            budget.append(statement)
+        if self.enabled and has_request_context() and 'queries' in g:
+            g.queries.append((elapsed, statement))
+            if elapsed >= self.slow:
+                logger.warning('%.1fms %s: %s', elapsed * 1000, request.endpoint, statement)
+
+    #  Requests
+    #  ----------------------------------------------------------------
+
+    def _start_request(self):
+        g.queries = []
+
+    def _end_request(self, response):
+        queries = g.pop('queries', None)
+        if queries is None:
+            return response
+        db_time = sum(elapsed for elapsed, _ in queries)
+        with self.lock:
+            self.endpoints.setdefault(request.endpoint, EndpointStats()).add(len(queries), db_time, queries)
+        if self.headers:
+            response.headers['X-Query-Count'] = str(len(queries))
+            response.headers['X-Query-Time-Ms'] = f'{db_time * 1000:.1f}'
+        return response
+
+    def report(self):
+        """{endpoint: {'requests', 'queries_per_request', 'max_queries', 'db_ms_per_request', 'slowest'}}, most queries first."""
+        with self.lock:
+            report = {endpoint: stats.to_dict() for endpoint, stats in self.endpoints.items()}
+        return dict(sorted(report.items(), key=lambda item: item[1]['queries_per_request'], reverse=True))
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    #  Budgets
+    #  ----------------------------------------------------------------
+
+    @contextmanager
+    def budget(self, max_queries):
+        """Raises QueryBudgetExceeded when the block runs more than max_queries queries (in this thread)."""
+        self._listen()
+        statements = []
+        active = self.budgets.__dict__.setdefault('active', [])
+        active.append(statements)
+        try:
+            yield statements
+        finally:
+            # by identity: a nested budget's list compares equal to this one's when both saw the same statements
+            del active[next(i for i, other in enumerate(active) if other is statements)]
+        if len(statements) > max_queries:
+            raise QueryBudgetExceeded(f'{len(statements)} queries, budget {max_queries}:\n' + '\n'.join(statements))
+
+
+profiler = QueryProfiler()
@@ -0,0 +1,112 @@
+import base64
+import json
+from datetime import datetime
+from models import db, Venue, Artist, Show
+
+# rows per page of the keyset paginated listings (/artists, /shows)
+PAGE_SIZE = 30
+
+def catalog_filters(session, Model, genre=None, city=None, state=None):
+    """
+    Filter criteria of Model (Artist / Venue) for the given genre / city / state.
+    On postgres the genre is an array containment (genres @> ARRAY[genre]) served by the GIN index on genres,
+    sqlite looks through the JSON list with json_each. state and city (case insensitive, city is free text)
+    use the (state, lower(city)) index.
+    """
+    criteria = []
+    if genre:
+        if session.bind.dialect.name == 'postgresql':
+            criteria.append(Model.genres.contains([genre]))
+        else:
+            genres = db.func.json_each(Model.genres).table_valued('value')
+            criteria.append(db.select(genres.c.value).where(genres.c.value == genre).exists())
+    if state:
+        criteria.append(Model.state == state)
+    if city:
+        criteria.append(db.func.lower(Model.city) == city.strip().lower())
+    return criteria
+
+def venue_areas(session, filters=()):
+    """
+    Returns the venues grouped by "city,state" (the areas structure pages/venues.html expects).
+    Every venue comes with its denormalised upcoming show count (counters.py), so the shows table is not read at all.
+    filters are catalog_filters() criteria.
+    """
+    rows = session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_show_count)\
+        .filter(*filters)\
+        .order_by(Venue.state, Venue.city, Venue.id)
+
+    areas = {}
+    for venue_id, name, city, state, num_upcoming_shows in rows:
+        # the first venue of a city creates its area
+        area = areas.setdefault(f'{city},{state}', {'venues': []})
+        area['venues'].append({'id': venue_id, 'name': name, 'num_upcoming_shows': num_upcoming_shows})
+    return areas
+
+def show_rows(session):
+    """
+    Query of the shows joined with the artist/venue columns provide_min_show() formats.
+    One joined select returns plain named rows, so no Show/Artist/Venue instances end up in the session
+    and nothing is lazily loaded per show.
+    """
+    return session.query(
+            Show.id,
+            Show.start_time,
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Venue.image_link.label('venue_image_link'))\
+        .join(Artist, Show.artist_id == Artist.id)\
+        .join(Venue, Show.venue_id == Venue.id)
+
+def upcoming_shows(query, now):
+    """Filters a Show query down to the shows starting after now, soonest first (served by the start_time index)."""
+    return query.filter(Show.start_time > now).order_by(Show.start_time)
+
+def past_shows(query, now):
+    """Filters a Show query down to the shows that already started, latest first."""
+    return query.filter(Show.start_time <= now).order_by(Show.start_time.desc())
+
+def keyset_page(query, order_columns, after=None, page_size=PAGE_SIZE):
+    """
+    Returns (rows, next_cursor) for one page of query ordered by order_columns.
+    after holds the order column values of the last row of the previous page, the page continues strictly after them
+    with a row value comparison, so a deep page costs the same index range scan as the first one (no OFFSET).
+    next_cursor is None on the last page.
+    """
+    if after is not None:
+        # bind the cursor values with the column types so they compare like the stored values
+        values = [db.literal(value, column.type) for column, value in zip(order_columns, after)]
+        query = query.filter(db.tuple_(*order_columns) > db.tuple_(*values))
+    # one extra row tells whether there is a next page
+    rows = query.order_by(*order_columns).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in order_columns])
+
+def encode_cursor(values):
+    """Opaque, url safe cursor from the order column values of a row."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, *types):
+    """
+    Inverse of encode_cursor(), types convert the values back (e.g. int, datetime.fromisoformat).
+    Returns None without a cursor, raises ValueError for a malformed one.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'invalid cursor: {cursor}') from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError(f'invalid cursor: {cursor}')
+    try:
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError) as e:
+        # well formed json holding values of the wrong type
+        raise ValueError(f'invalid cursor: {cursor}') from e
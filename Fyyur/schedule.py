@@ -0,0 +1,60 @@
+from sqlalchemy import and_, or_, func
+
+from models import Show, SHOW_DURATION
+
+def as_aware(value):
+    """Naive datetimes (form input, sqlite columns) are taken as server local time so they compare with timezone aware ones."""
+    return value if value.tzinfo else value.astimezone()
+
+def within_availability(artist, start_time):
+    """Whether start_time (a datetime) fits the availability window of the artist, always true without a restriction."""
+    if not artist.availability_restriction:
+        return True
+    return as_aware(artist.from_time) <= as_aware(start_time) <= as_aware(artist.to_time)
+
+# bookings checked per query by find_conflicts, an OR of many more terms exceeds sqlite's expression depth limit
+CONFLICT_BATCH_SIZE = 100
+
+def overlaps(session, column, value, start_time, end_time):
+    """
+    Condition for the shows of column = value (an artist or venue) that overlap [start_time, end_time).
+    Postgres compares tstzrange(start_time, end_time) like the exclusion constraints do, so their gist indexes serve it.
+    Elsewhere shows last SHOW_DURATION, so only shows starting in (start_time - SHOW_DURATION, end_time) can overlap,
+    a bounded range scan of the (foreign key, start_time) index.
+    """
+    if session.bind.dialect.name == 'postgresql':
+        return and_(column == value, func.tstzrange(Show.start_time, Show.end_time).op('&&')(func.tstzrange(start_time, end_time)))
+    return and_(column == value, Show.start_time < end_time, Show.start_time > start_time - SHOW_DURATION, Show.end_time > start_time)
+
+def find_conflict(session, artist_id, venue_id, start_time, end_time):
+    """
+    Returns 'artist' or 'venue' when a show of that artist/venue overlaps [start_time, end_time), None otherwise.
+    Postgres enforces the same rule atomically with exclusion constraints, this check gives the reason up front.
+    """
+    for kind, column, value in (('artist', Show.artist_id, artist_id), ('venue', Show.venue_id, venue_id)):
+        overlapping = session.query(Show.id).filter(overlaps(session, column, value, start_time, end_time)).limit(1)
+        if overlapping.first():
+            return kind
+    return None
+
+def find_conflicts(session, bookings):
+    """
+    find_conflict for many bookings, (artist_id, venue_id, start_time, end_time) tuples, venue_id may be None.
+    Returns 'artist', 'venue' or None per booking, with one query per table for every CONFLICT_BATCH_SIZE bookings.
+    """
+    conflicts = [None] * len(bookings)
+    for kind, column, position in (('artist', Show.artist_id, 0), ('venue', Show.venue_id, 1)):
+        wanted = [(i, booking) for i, booking in enumerate(bookings) if conflicts[i] is None and booking[position] is not None]
+        shows = {}
+        for offset in range(0, len(wanted), CONFLICT_BATCH_SIZE):
+            batch = wanted[offset:offset + CONFLICT_BATCH_SIZE]
+            overlapping = session.query(column, Show.start_time, Show.end_time).filter(or_(*(
+                overlaps(session, column, booking[position], booking[2], booking[3]) for _, booking in batch)))
+            for owner_id, start_time, end_time in overlapping:
+                shows.setdefault(owner_id, set()).add((as_aware(start_time), as_aware(end_time)))
+        # the queries return the shows overlapping any booking, match them to the bookings they overlap
+        for i, booking in wanted:
+            start_time, end_time = as_aware(booking[2]), as_aware(booking[3])
+            if any(start < end_time and end > start_time for start, end in shows.get(booking[position], ())):
+                conflicts[i] = kind
+    return conflicts
@@ -0,0 +1,81 @@
+from models import db, Venue, Artist
+
+# number of results shown per search page
+SEARCH_RESULTS_PER_PAGE = 20
+
+#----------------------------------------------------------------------------#
+# Sqlite full text index.
+#----------------------------------------------------------------------------#
+
+# On postgres the names are indexed by trigram GIN indexes (see the migration), a local sqlite
+# database gets an FTS5 table per model instead, kept in sync with the model table by triggers.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5(name, content='{table}', content_rowid='id')",
+    """CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+)
+
+def _create_fts(target, connection, **kw):
+    """Creates the FTS5 table and its triggers right after db.create_all() created the model table on sqlite."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement.format(table=target.name))
+
+for Model in (Venue, Artist):
+    db.event.listen(Model.__table__, 'after_create', _create_fts)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def _like_pattern(term):
+    """%term% with the LIKE wildcards in term escaped."""
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{term}%'
+
+def search_names(session, Model, search_term, page=1):
+    """
+    Model = Artist / Venue
+    Searches Model names for the words of the search term in one ranked query.
+    Names matching more of the words rank first, the page is cut by LIMIT/OFFSET and the total
+    number of matches comes back with the rows (count(*) over ()).
+    Returns {'data': [{'id', 'name', 'num_upcoming_shows'}], 'count': total, 'page', 'has_next'}.
+    """
+    terms = search_term.split()
+    if not terms:
+        return {'data': [], 'count': 0, 'page': page, 'has_next': False}
+    columns = [Model.id, Model.name, Model.upcoming_show_count.label('num_upcoming_shows'), db.func.count().over().label('total')]
+
+    if session.bind.dialect.name == 'sqlite':
+        fts = db.table(f'{Model.__tablename__}_fts', db.column('rowid'), db.column('rank'))
+        # every word is matched as a prefix, the bm25 rank orders rows matching more (and rarer) words first
+        match = ' OR '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        query = session.query(*columns)\
+            .join(fts, fts.c.rowid == Model.id)\
+            .filter(db.literal_column(fts.name).op('MATCH')(match))\
+            .order_by(fts.c.rank, Model.id)
+    else:
+        # every ILIKE is served by the trigram index on name
+        matches = [Model.name.ilike(_like_pattern(term), escape='\\') for term in terms]
+        matched_terms = sum(db.case((match, 1), else_=0) for match in matches)
+        query = session.query(*columns)\
+            .filter(db.or_(*matches))\
+            .order_by(matched_terms.desc(), db.func.similarity(Model.name, search_term).desc(), Model.id)
+
+    rows = query.limit(SEARCH_RESULTS_PER_PAGE).offset((page - 1) * SEARCH_RESULTS_PER_PAGE).all()
+    total = rows[0].total if rows else 0
+    return {
+        'data': [{'id': row.id, 'name': row.name, 'num_upcoming_shows': row.num_upcoming_shows} for row in rows],
+        'count': total,
+        'page': page,
+        'has_next': page * SEARCH_RESULTS_PER_PAGE < total
+    }
@@ -2,24 +2,88 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
+from sqlalchemy import func
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category
+from . import search
+from .cache import TTLCache
+from .sampling import QuestionSampler
+from .quiz_sessions import create_store, new_session_id
 
 QUESTIONS_PER_PAGE = 10
 
-def get_paginated(page, selection):
-    start = (page - 1) * QUESTIONS_PER_PAGE 
-    end = page * QUESTIONS_PER_PAGE 
-    return selection[start:end]
+def get_paginated(page, selection, after=None):
+    '''
+    One page of the selection (a Question query) fetched with LIMIT/OFFSET in id order.
+    With after (the id of the last question of the previous page) the page starts right after it instead,
+    an index range scan that costs the same on the last page as on the first.
+    '''
+    selection = selection.order_by(Question.id)
+    if after is not None:
+        return selection.filter(Question.id > after).limit(QUESTIONS_PER_PAGE).all()
+    return selection.limit(QUESTIONS_PER_PAGE).offset((page - 1) * QUESTIONS_PER_PAGE).all()
+
+def get_paginated_with_total(page, selection, after=None):
+    '''
+    get_paginated and the number of questions in the whole selection, counted by a count(*) window
+    over the same query so both come back in one round trip.
+    The total is None when the page does not tell it (after pages, pages past the end).
+    '''
+    if after is not None:
+        return get_paginated(page, selection, after), None
+    rows = get_paginated(page, selection.add_columns(func.count().over()))
+    return [question for question, _ in rows], rows[0][1] if rows else None
+
+def next_after(questions):
+    '''The after cursor of the page following questions, None on the last page.'''
+    return questions[-1].id if len(questions) == QUESTIONS_PER_PAGE else None
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    # quiz sessions: 'memory' (per process) or 'redis' (shared) store, idle expiry and questions per session
+    app.config.from_mapping(
+        QUIZ_SESSION_STORE=os.environ.get('QUIZ_SESSION_STORE', 'memory'),
+        QUIZ_SESSION_TTL=int(os.environ.get('QUIZ_SESSION_TTL', 3600)),
+        QUIZ_SESSION_REDIS_URL=os.environ.get('QUIZ_SESSION_REDIS_URL', 'redis://localhost:6379/0'),
+        QUIZ_SESSION_QUESTIONS=int(os.environ.get('QUIZ_SESSION_QUESTIONS', 50)))
+    if test_config is not None:
+        app.config.from_mapping(test_config)
     setup_db(app)
 
     cors = CORS(app)
 
+    '''
+    question counts and the categories, invalidated when questions are added / deleted
+    '''
+    cache = TTLCache(ttl=app.config.get('COUNT_CACHE_TTL', 300))
+
+    def count_questions(category_id=None):
+        selection = Question.query
+        if category_id is not None:
+            category_id = int(category_id)
+            selection = selection.filter(Question.category == category_id)
+        return cache.get_or_set(('count', category_id), selection.count)
+
+    def get_category_types():
+        return cache.get_or_set('categories', lambda: {c.id:c.type for c in Category.query.all()})
+
+    def invalidate_counts(category_id):
+        cache.delete(('count', None))
+        # a question loses its category (NULL) when the category is deleted
+        if category_id is not None:
+            cache.delete(('count', int(category_id)))
+
+    def search_indexed(connection):
+        # python -m flaskr.search creates the index, until then search scans the questions
+        return cache.get_or_set('search_index', lambda: search.has_search_index(connection))
+
+    '''
+    question ids per category for the quizzes, kept current by add_question / delete_question
+    '''
+    sampler = QuestionSampler(app, refresh=app.config.get('SAMPLER_REFRESH', 300))
+    quiz_sessions = create_store(app.config)
+
     '''
     after_request decorator to set Access-Control-Allow
     '''
@@ -59,16 +123,17 @@ def create_app(test_config=None):
     @app.route('/questions')
     def get_questions():
         page = request.args.get('page', 1, type=int)
+        # ?after=<id of the last question shown> pages by id instead of page number
+        after = request.args.get('after', type=int)
         # in case someone using the api enters a page less than 1
         if page < 1:
             abort(422)
-        selection = Question.query.all()
-        questions = get_paginated(page, selection)
+        questions = get_paginated(page, Question.query, after)
         if len(questions) == 0:
             abort(404)
+        cursor = next_after(questions)
         questions = [question.format() for question in questions]
-        categories = {c.id:c.type for c in Category.query.all()}
-        return jsonify({'message': 'success', 'status': 200, 'questions': questions, 'total_questions': len(selection), 'categories': categories,'current_category': None, 'page': page}), 200
+        return jsonify({'message': 'success', 'status': 200, 'questions': questions, 'total_questions': count_questions(), 'categories': get_category_types(),'current_category': None, 'page': page, 'next_after': cursor}), 200
             
     '''
     Endpoint to DELETE question using a question ID. 
@@ -79,6 +144,8 @@ def create_app(test_config=None):
         if question is None:
             abort(404)
         question.delete()
+        invalidate_counts(question.category)
+        sampler.remove(question.id, question.category)
         return jsonify({'message': 'Deleted question with id ' + question_id, 'status': 200}), 200
     
     '''
@@ -102,18 +169,21 @@ def create_app(test_config=None):
             question = json_info['question']
             answer = json_info['answer']
             difficulty = json_info['difficulty']
-            category = json_info['category']
-        except KeyError:
+            category = int(json_info['category'])
+        except (KeyError, TypeError, ValueError):
             abort(400)
 
         question = Question(question, answer, category, difficulty)
         question.insert()
+        invalidate_counts(question.category)
+        sampler.add(question.id, question.category)
         return jsonify({'message': 'Added question', 'status': 200, 'question_id': question.id}), 200
 
     '''
     POST endpoint to get questions based on a search term. 
-    It should return any questions for whom the search term 
-    is a substring of the question. 
+    It returns a page (?page=) of the questions for whom the search term 
+    is a substring of the question, best matches first, 
+    optionally filtered by category and difficulty. 
     '''
     @app.route('/questions/search', methods=['POST']) 
     def search_questions():
@@ -124,30 +194,52 @@ def create_app(test_config=None):
 
         if search_term is None:
             raise abort(400) 
-        result = Question.query.filter(Question.question.ilike('%'+search_term+'%')).all()
-        result = [question.format() for question in result]
-        return jsonify({'message': 'success', 'status': 200, 'questions': result, 'total_questions': len(result), 'current_category': None}), 200
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            abort(422)
+        json_info = request.get_json()
+        category = json_info.get('category')
+        difficulty = json_info.get('difficulty')
+        try:
+            category = None if category is None else int(category)
+        except (TypeError, ValueError):
+            abort(400)
+        if difficulty is not None and not isinstance(difficulty, int):
+            abort(400)
+        with db.engine.connect() as connection:
+            rows, total = search.search_questions(connection, search_term, category, difficulty,
+                limit=QUESTIONS_PER_PAGE, offset=(page - 1) * QUESTIONS_PER_PAGE, indexed=search_indexed(connection))
+        if len(rows) == 0 and page > 1:
+            abort(404)
+        result = [{'id': row.id, 'question': row.question, 'answer': row.answer, 'category': row.category, 'difficulty': row.difficulty} for row in rows]
+        return jsonify({'message': 'success', 'status': 200, 'questions': result, 'total_questions': total or 0, 'current_category': category, 'page': page}), 200
 
     '''
     GET endpoint to get questions based on category. 
     '''
-    @app.route('/categories/<string:category_id>/questions')
+    @app.route('/categories/<int:category_id>/questions')
     def get_category_questions(category_id):
         page = request.args.get('page', 1, type=int)
         if page < 1:
             abort(400)
-        category = Category.query.get(category_id)
-        if category is None:
+        # the cached categories spare a query per request
+        if category_id not in get_category_types():
             abort(404)
-        # get all questions under the certain category
+        # the page and the number of questions in the category from one query on the category index
         selection = Question.query.filter(Question.category == category_id)
-        if selection.first() is None:
+        questions, total = get_paginated_with_total(page, selection, request.args.get('after', type=int))
+        if total is not None:
+            cache.set(('count', category_id), total)
+        else:
+            total = count_questions(category_id)
+        # no questions under the certain category
+        if total == 0:
             abort(404)
-        questions = get_paginated(page, selection)
         if len(questions) == 0:
             abort(400)
+        cursor = next_after(questions)
         questions = [question.format() for question in questions]
-        return jsonify({'message': 'success', 'status': 200, 'questions': questions, 'total_questions': len(questions), 'current_category': category.id}),200
+        return jsonify({'message': 'success', 'status': 200, 'questions': questions, 'total_questions': total, 'current_category': category_id, 'next_after': cursor}),200
 
     '''
     POST endpoint to get questions to play the quiz. 
@@ -161,24 +253,75 @@ def create_app(test_config=None):
         prev_qs = json_info['previous_questions']
         category = json_info['quiz_category']
 
-        # show all
-        if category.get('type') == 'click':
-            questions = Question.query.all()
-        # show a certain category
-        else:
-            questions = Question.query.filter(Question.category==category.get('id')).all()
-
-        # get questions that are not in the previous_questions
-        questions = [question for question in questions if question.id not in prev_qs]
-        questions_length = len(questions)
-        # stop the game
-        if questions_length == 0:
-            current_question = False 
-        # a random question 
-        else:
-            current_question = questions[random.randint(0, questions_length-1)].format()
+        # show all, or a certain category
+        category_id = None if category.get('type') == 'click' else category.get('id')
+
+        # a random question that is not in the previous_questions (sampling.py), only that question is loaded
+        prev_qs = set(prev_qs)
+        current_question = False
+        while True:
+            question_id = sampler.sample(category_id, prev_qs)
+            # stop the game
+            if question_id is None:
+                break
+            question = Question.query.get(question_id)
+            if question is not None:
+                current_question = question.format()
+                break
+            # deleted by another process since the sampler was loaded
+            sampler.remove(question_id, category_id)
+            prev_qs.add(question_id)
         return jsonify({'message': 'success', 'status': 200, 'question': current_question}), 200
 
+    '''
+    POST endpoint to start a quiz session. 
+    Takes the quiz_category (like /quizzes) and returns a session_id, 
+    the shuffled questions of the quiz are kept on the server. 
+    '''
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def create_quiz_session():
+        json_info = request.get_json(silent=True) or {}
+        category = json_info.get('quiz_category')
+        if not isinstance(category, dict):
+            abort(400)
+        category_id = None if category.get('type') == 'click' else category.get('id')
+        # a random order of (at most QUIZ_SESSION_QUESTIONS) questions, drawn without loading them
+        question_ids = sampler.draw(category_id, app.config['QUIZ_SESSION_QUESTIONS'])
+        session_id = new_session_id()
+        quiz_sessions.create(session_id, question_ids)
+        return jsonify({'message': 'success', 'status': 200, 'session_id': session_id, 'total_questions': len(question_ids)}), 200
+
+    '''
+    POST endpoint to get the next question of a quiz session, 
+    question is False when every question was played. 
+    '''
+    @app.route('/quizzes/sessions/<string:session_id>/next', methods=['POST'])
+    def next_quiz_question(session_id):
+        current_question = False
+        try:
+            while True:
+                question_id = quiz_sessions.pop(session_id)
+                if question_id is None:
+                    break
+                question = Question.query.get(question_id)
+                # skip questions deleted since the session started
+                if question is not None:
+                    current_question = question.format()
+                    break
+            remaining = quiz_sessions.remaining(session_id)
+        except KeyError:
+            # unknown or expired session
+            abort(404)
+        return jsonify({'message': 'success', 'status': 200, 'question': current_question, 'remaining': remaining}), 200
+
+    '''
+    DELETE endpoint to end a quiz session. 
+    '''
+    @app.route('/quizzes/sessions/<string:session_id>', methods=['DELETE'])
+    def delete_quiz_session(session_id):
+        quiz_sessions.delete(session_id)
+        return jsonify({'message': 'Deleted quiz session', 'status': 200}), 200
+
     '''
     Error Handlers 
     '''
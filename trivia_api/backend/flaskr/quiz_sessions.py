@@ -0,0 +1,95 @@
+import secrets
+from collections import deque
+
+from .cache import TTLCache
+
+class MemorySessionStore:
+    '''
+    Quiz sessions of this process, a deque of the remaining question ids per session id.
+    Least recently used sessions are evicted beyond max_sessions, idle sessions expire after ttl seconds.
+    '''
+    def __init__(self, ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.sessions = TTLCache(max_entries=max_sessions, ttl=ttl)
+
+    def create(self, session_id, question_ids):
+        self.sessions.set(session_id, deque(question_ids))
+
+    def pop(self, session_id):
+        '''The next question id of the session, None when it is finished. Raises KeyError for an unknown session.'''
+        remaining = self.sessions.get(session_id)
+        if remaining is None:
+            raise KeyError(session_id)
+        # every call is a use, so an active quiz does not expire
+        self.sessions.set(session_id, remaining)
+        try:
+            # deque.popleft is atomic, concurrent calls never get the same question
+            return remaining.popleft()
+        except IndexError:
+            return None
+
+    def remaining(self, session_id):
+        remaining = self.sessions.get(session_id)
+        if remaining is None:
+            raise KeyError(session_id)
+        return len(remaining)
+
+    def delete(self, session_id):
+        self.sessions.delete(session_id)
+
+
+class RedisSessionStore:
+    '''
+    Quiz sessions shared by every process in a (local) redis compatible server: a list of the remaining
+    question ids per session, popped with LPOP, and a marker key that tells a finished session from an unknown one.
+    '''
+    namespace = 'trivia:quiz:'
+
+    def __init__(self, url, ttl=3600):
+        # optional dependency, only needed when QUIZ_SESSION_STORE = 'redis'
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _keys(self, session_id):
+        return self.namespace + session_id, self.namespace + session_id + ':active'
+
+    def create(self, session_id, question_ids):
+        questions, active = self._keys(session_id)
+        pipeline = self.client.pipeline()
+        if question_ids:
+            pipeline.rpush(questions, *question_ids)
+            pipeline.expire(questions, self.ttl)
+        pipeline.set(active, 1, ex=self.ttl)
+        pipeline.execute()
+
+    def pop(self, session_id):
+        questions, active = self._keys(session_id)
+        pipeline = self.client.pipeline()
+        pipeline.lpop(questions)
+        pipeline.expire(questions, self.ttl)
+        pipeline.expire(active, self.ttl)
+        question_id, _, exists = pipeline.execute()
+        if not exists:
+            raise KeyError(session_id)
+        return int(question_id) if question_id is not None else None
+
+    def remaining(self, session_id):
+        questions, active = self._keys(session_id)
+        if not self.client.exists(active):
+            raise KeyError(session_id)
+        return self.client.llen(questions)
+
+    def delete(self, session_id):
+        self.client.delete(*self._keys(session_id))
+
+
+def create_store(config):
+    '''The session store configured by QUIZ_SESSION_STORE ('memory' or 'redis'), QUIZ_SESSION_TTL and QUIZ_SESSION_REDIS_URL.'''
+    ttl = config.get('QUIZ_SESSION_TTL', 3600)
+    if config.get('QUIZ_SESSION_STORE', 'memory') == 'redis':
+        return RedisSessionStore(config.get('QUIZ_SESSION_REDIS_URL', 'redis://localhost:6379/0'), ttl)
+    return MemorySessionStore(ttl)
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
@@ -0,0 +1,102 @@
+import random
+import time
+from array import array
+from threading import Lock, Thread
+
+from models import db, Question
+
+class QuestionSampler:
+    '''
+    Picks a random question the player has not seen yet without loading the questions.
+    Keeps the ids of every category (and of all questions) in compact arrays, a sample draws random
+    positions and rejects the previous questions, expected O(1) as long as most questions are unseen.
+    add() / remove() keep the arrays current, a full reload every `refresh` seconds picks up
+    questions added or deleted by other processes. Only the first load runs in a request, the reloads
+    run in a background thread (in an app context of app) and swap the new arrays in.
+    '''
+    def __init__(self, app, refresh=300, max_attempts=32):
+        self.app = app
+        self.refresh = refresh
+        self.max_attempts = max_attempts
+        self.lock = Lock()
+        # held while a load runs, so there is only one at a time
+        self.loading = Lock()
+        # category id (string, None for all questions) -> array of question ids
+        self.ids = None
+        self.loaded = 0
+
+    def load(self):
+        '''(Re)builds the id arrays with one query over (id, category).'''
+        ids = {None: array('q')}
+        for question_id, category in db.session.query(Question.id, Question.category).yield_per(10000):
+            ids[None].append(question_id)
+            if category is not None:
+                ids.setdefault(str(category), array('q')).append(question_id)
+        with self.lock:
+            self.ids = ids
+            self.loaded = time.monotonic()
+
+    def _reload(self):
+        try:
+            with self.app.app_context():
+                self.load()
+        finally:
+            self.loading.release()
+
+    def _ensure_loaded(self):
+        if self.ids is None:
+            # concurrent first requests wait for the same load
+            with self.loading:
+                if self.ids is None:
+                    self.load()
+        elif time.monotonic() - self.loaded > self.refresh and self.loading.acquire(blocking=False):
+            # the requests keep drawing from the current arrays meanwhile
+            Thread(target=self._reload, daemon=True).start()
+
+    def add(self, question_id, category):
+        if self.ids is None:
+            return
+        with self.lock:
+            self.ids[None].append(question_id)
+            # questions without a category (NULL) are only played in quizzes of every category
+            if category is not None:
+                self.ids.setdefault(str(category), array('q')).append(question_id)
+
+    def remove(self, question_id, category):
+        if self.ids is None:
+            return
+        with self.lock:
+            for key in (None, str(category)) if category is not None else (None,):
+                ids = self.ids.get(key)
+                if ids is None or question_id not in ids:
+                    continue
+                # swap with the last id and drop it, the order of the ids does not matter
+                position = ids.index(question_id)
+                ids[position] = ids[-1]
+                ids.pop()
+
+    def draw(self, category=None, count=10):
+        '''count distinct random question ids of category (None for any category) in random order, fewer if it has less.'''
+        self._ensure_loaded()
+        with self.lock:
+            ids = self.ids.get(None if category is None else str(category)) or ()
+            return random.sample(ids, min(count, len(ids)))
+
+    def sample(self, category=None, exclude=()):
+        '''
+        A random question id of category (None for any category) that is not in exclude, None when every
+        question of the category was already played.
+        '''
+        self._ensure_loaded()
+        exclude = set(exclude)
+        with self.lock:
+            ids = self.ids.get(None if category is None else str(category))
+            if not ids:
+                return None
+            # rejection sampling, only a nearly exhausted category falls back to scanning its ids
+            for _ in range(self.max_attempts):
+                question_id = ids[random.randrange(len(ids))]
+                if question_id not in exclude:
+                    return question_id
+            remaining = [question_id for question_id in ids if question_id not in exclude]
+        return random.choice(remaining) if remaining else None
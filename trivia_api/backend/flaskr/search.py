@@ -0,0 +1,99 @@
+import sys
+from sqlalchemy import text
+
+'''
+Indexes for /questions/search, created once per database by create_search_index (python -m flaskr.search).
+
+postgresql: a pg_trgm GIN index on questions.question, it serves the ILIKE '%term%' filter
+            and the matches are ranked by trigram similarity.
+sqlite:     an FTS5 table over questions.question (trigram tokenizer, so it matches substrings like ILIKE),
+            kept in sync by triggers and ranked by bm25. Used by the tests.
+'''
+SEARCH_INDEX_DDL = {
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS ix_questions_question_trgm ON questions USING gin (question gin_trgm_ops)',
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(question, content='questions', content_rowid='id', tokenize='trigram')",
+        '''CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+            INSERT INTO questions_fts (rowid, question) VALUES (new.id, new.question);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+            INSERT INTO questions_fts (questions_fts, rowid, question) VALUES ('delete', old.id, old.question);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF question ON questions BEGIN
+            INSERT INTO questions_fts (questions_fts, rowid, question) VALUES ('delete', old.id, old.question);
+            INSERT INTO questions_fts (rowid, question) VALUES (new.id, new.question);
+        END''',
+        # index the questions that existed before the table
+        "INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')",
+    ],
+}
+
+# the trigram tokenizer only matches terms of at least 3 characters
+FTS_MIN_LENGTH = 3
+
+def create_search_index(engine):
+    '''Creates the search index of the engine's database, safe to run again.'''
+    statements = SEARCH_INDEX_DDL.get(engine.dialect.name, [])
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+def has_search_index(connection):
+    '''True when create_search_index has run on the database, search falls back to an unranked ILIKE scan otherwise.'''
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        return connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    if dialect == 'sqlite':
+        return connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'")).first() is not None
+    return False
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_questions(connection, term, category=None, difficulty=None, limit=10, offset=0, indexed=True):
+    '''
+    One page of the questions whose text contains term, best matches first, as (question rows, total matches).
+    The total comes from a count(*) window over the same query, so a page is one round trip.
+    '''
+    params = {'term': term, 'pattern': '%' + escape_like(term) + '%', 'limit': limit, 'offset': offset}
+    filters = []
+    if category is not None:
+        filters.append('q.category = :category')
+        params['category'] = int(category)
+    if difficulty is not None:
+        filters.append('q.difficulty = :difficulty')
+        params['difficulty'] = difficulty
+
+    dialect = connection.dialect.name
+    if indexed and dialect == 'postgresql':
+        source = 'questions q'
+        filters.insert(0, "q.question ILIKE :pattern ESCAPE '\\'")
+        rank = 'similarity(q.question, :term) DESC'
+    elif indexed and dialect == 'sqlite' and len(term) >= FTS_MIN_LENGTH:
+        source = 'questions_fts f JOIN questions q ON q.id = f.rowid'
+        filters.insert(0, 'questions_fts MATCH :match')
+        # a quoted fts5 string, matched as a substring by the trigram tokenizer
+        params['match'] = '"' + term.replace('"', '""') + '"'
+        rank = 'f.rank'
+    else:
+        source = 'questions q'
+        filters.insert(0, "lower(q.question) LIKE lower(:pattern) ESCAPE '\\'")
+        rank = None
+
+    order = (rank + ', ' if rank else '') + 'q.id'
+    statement = text(
+        'SELECT q.id, q.question, q.answer, q.category, q.difficulty, count(*) OVER () AS total '
+        'FROM ' + source + ' WHERE ' + ' AND '.join(filters) + ' '
+        'ORDER BY ' + order + ' LIMIT :limit OFFSET :offset')
+    rows = connection.execute(statement, params).fetchall()
+    total = rows[0].total if rows else None
+    return rows, total
+
+if __name__ == '__main__':
+    # python -m flaskr.search [database url], the trivia database by default
+    from sqlalchemy import create_engine
+    from models import database_path
+    create_search_index(create_engine(sys.argv[1] if len(sys.argv) > 1 else database_path))
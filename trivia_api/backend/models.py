@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, create_engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -21,6 +21,9 @@ def setup_db(app, database_path=database_path):
     db.app = app
     db.init_app(app)
     db.create_all()
+    # create_all skips existing tables, add the indexes declared since the table was created
+    for index in Question.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
 
 '''
 Question
@@ -32,7 +35,8 @@ class Question(db.Model):
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  # the questions of a category are looked up by this column (category pages, counts, quizzes)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'), index=True)
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
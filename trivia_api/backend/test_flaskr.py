@@ -4,6 +4,7 @@ import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
+from flaskr.search import create_search_index
 from models import setup_db, Question, Category
 
 
@@ -27,6 +28,8 @@ class TriviaTestCase(unittest.TestCase):
             self.db.init_app(self.app)
             # create all tables
             self.db.create_all()
+            # the trigram index (postgresql) / fts5 table (sqlite) behind /questions/search
+            create_search_index(self.db.engine)
     
     def tearDown(self):
         """Executed after reach test"""
@@ -61,6 +64,19 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(result)
         # delete question
         self.client().delete('/questions/'+str(data.get('question_id')))
+    def test_get_questions_after(self):
+        first_page = json.loads(self.client().get('/questions').data)
+        result = self.client().get('/questions?after='+str(first_page['next_after']))
+        data = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(data['questions'][0]['id'] > first_page['questions'][-1]['id'])
+    def test_total_questions_after_creating_question(self):
+        total = json.loads(self.client().get('/questions').data)['total_questions']
+        result = self.client().post('/questions', json={'question': 'What does SQL stand for?', 'answer': 'Structured Query Language', 'difficulty': 1, 'category': 1})
+        question_id = json.loads(result.data).get('question_id')
+        self.assertEqual(json.loads(self.client().get('/questions').data)['total_questions'], total + 1)
+        self.client().delete('/questions/'+str(question_id))
+        self.assertEqual(json.loads(self.client().get('/questions').data)['total_questions'], total)
     def test_creating_invalid_question(self):
         result = self.client().post('/questions', json={'question': 'What does TCP stand for?'})
         self.assertEqual(result.status_code, 400)
@@ -73,6 +89,12 @@ class TriviaTestCase(unittest.TestCase):
         result = self.client().delete('/questions/14')
         data = json.loads(result.data)
         self.assertEqual(result.status_code, 200)
+    def test_delete_question_without_category(self):
+        # the category of a question is set to NULL when the category is deleted
+        question = Question('Which question has no category?', 'This one', None, 1)
+        question.insert()
+        result = self.client().delete('/questions/'+str(question.id))
+        self.assertEqual(result.status_code, 200)
     def test_delete_invalid_question(self):
         result = self.client().delete('/questions/1000')
         data = json.loads(result.data)
@@ -89,6 +111,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(result.status_code, 200)
         data = json.loads(result.data) 
         self.assertTrue(data.get('total_questions'))
+    def test_search_is_paginated(self):
+        result = self.client().post('/questions/search?page=1', json={'searchTerm': 'e'})
+        data = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(len(data['questions']) <= 10)
+        self.assertTrue(data['total_questions'] >= len(data['questions']))
+    def test_search_beyond_last_page(self):
+        result = self.client().post('/questions/search?page=1000', json={'searchTerm': 'e'})
+        self.assertEqual(result.status_code, 404)
+    def test_search_with_filters(self):
+        result = self.client().post('/questions/search', json={'searchTerm': 'the', 'category': 1, 'difficulty': 1})
+        data = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        for question in data['questions']:
+            self.assertEqual(str(question['category']), '1')
+            self.assertEqual(question['difficulty'], 1)
+    def test_search_finds_new_question(self):
+        result = self.client().post('/questions', json={'question': 'Which protocol serves web pages?', 'answer': 'HTTP', 'difficulty': 2, 'category': 1})
+        question_id = json.loads(result.data).get('question_id')
+        data = json.loads(self.client().post('/questions/search', json={'searchTerm': 'protocol serves'}).data)
+        self.assertEqual(data['questions'][0]['id'], question_id)
+        self.client().delete('/questions/'+str(question_id))
+        data = json.loads(self.client().post('/questions/search', json={'searchTerm': 'protocol serves'}).data)
+        self.assertEqual(data['total_questions'], 0)
 
     """
     GET /categories/<category_id>/questions
@@ -102,6 +148,55 @@ class TriviaTestCase(unittest.TestCase):
     def test_questions_by_negative_page(self):
         result = self.client().get('/categories/1/questions?page=-12')
         self.assertEqual(result.status_code, 400)
+    def test_questions_by_category_total(self):
+        total = Question.query.filter(Question.category == 1).count()
+        result = self.client().get('/categories/1/questions')
+        data = json.loads(result.data)
+        self.assertEqual(data['total_questions'], total)
+        self.assertTrue(all(question['category'] == 1 for question in data['questions']))
+
+    """
+    POST /quizzes
+    """
+    def test_quiz_skips_previous_questions(self):
+        category = json.loads(self.client().get('/categories/1/questions').data)
+        previous = [question['id'] for question in category['questions']][1:]
+        result = self.client().post('/quizzes', json={'previous_questions': previous, 'quiz_category': {'type': 'Science', 'id': 1}})
+        data = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(data['question']['id'], category['questions'][0]['id'])
+    def test_quiz_without_unseen_questions(self):
+        category = json.loads(self.client().get('/categories/1/questions').data)
+        previous = [question['id'] for question in category['questions']]
+        result = self.client().post('/quizzes', json={'previous_questions': previous, 'quiz_category': {'type': 'Science', 'id': 1}})
+        data = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        self.assertFalse(data['question'])
+
+    """
+    /quizzes/sessions
+    """
+    def test_quiz_session_plays_every_question_once(self):
+        category = json.loads(self.client().get('/categories/1/questions').data)
+        result = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Science', 'id': 1}})
+        session = json.loads(result.data)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(session['total_questions'], len(category['questions']))
+        played = []
+        for _ in range(session['total_questions']):
+            data = json.loads(self.client().post('/quizzes/sessions/'+session['session_id']+'/next').data)
+            played.append(data['question']['id'])
+        self.assertEqual(sorted(played), sorted(question['id'] for question in category['questions']))
+        data = json.loads(self.client().post('/quizzes/sessions/'+session['session_id']+'/next').data)
+        self.assertFalse(data['question'])
+        self.assertEqual(data['remaining'], 0)
+        self.client().delete('/quizzes/sessions/'+session['session_id'])
+    def test_quiz_session_unknown(self):
+        result = self.client().post('/quizzes/sessions/unknown/next')
+        self.assertEqual(result.status_code, 404)
+    def test_quiz_session_without_category(self):
+        result = self.client().post('/quizzes/sessions', json={})
+        self.assertEqual(result.status_code, 400)
 
 # Make the tests conveniently executable
 if __name__ == "__main__":